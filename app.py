@@ -96,30 +96,44 @@ Major Changes in v1.2.1:
 
 """
 
-from flask import Flask, render_template, request, jsonify, send_file, send_from_directory, after_this_request
+from flask import Flask, Response, render_template, request, jsonify, send_file, send_from_directory, after_this_request
+from flask.json.provider import DefaultJSONProvider
+import orjson
 import sys
 import xml.etree.ElementTree as ET
 import math
 import io
+import array
+import numpy as np
 import csv
+from collections import namedtuple
 from datetime import datetime, timezone
 from werkzeug.utils import secure_filename
-import json
 import os
 import platform
-from functools import wraps
+import threading
+import time
+import hashlib
+import heapq
+from functools import wraps, lru_cache
 from dotenv import load_dotenv
 from whitenoise import WhiteNoise
-import markdown2
 import re
 import base64
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak, KeepTogether
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from PIL import Image as PILImage
+
+# Optional JIT compilation of the route kernel (numba is not a required dependency)
+try:
+    from numba import njit
+    numba_available = True
+except ImportError:
+    numba_available = False
+
+# Optional gzip compression of API responses
+try:
+    from flask_compress import Compress
+    compress_available = True
+except ImportError:
+    compress_available = False
 
 # Load environment variables
 load_dotenv()
@@ -171,8 +185,33 @@ else:
     print("  App will run in legacy file-based mode")
     print("  Set SUPABASE_URL and SUPABASE_ANON_KEY to enable authentication")
 
+# Supabase configuration is fixed at startup, so request handlers check this flag
+# rather than re-testing the credentials and import on every call
+SUPABASE_READY = bool(SUPABASE_URL and SUPABASE_ANON_KEY and supabase_import_available)
+
 app = Flask(__name__)
 
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson, which is several times faster than the
+    standard library on the float-heavy plan responses and serializes NumPy
+    arrays and scalars natively. Keys stay sorted like Flask's default provider,
+    and dates still go through Flask's default handling.
+    """
+    option = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS |
+              orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME)
+    
+    def dumps(self, obj, **kwargs):
+        option = self.option
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+app.json = OrjsonProvider(app)
+
 # Extract version from docstring or use environment variable
 def extract_app_version():
     """Extract version from module docstring or environment variable."""
@@ -202,22 +241,33 @@ app.wsgi_app = WhiteNoise(
     max_age=0 if os.environ.get('FLASK_ENV') == 'development' else 31536000  # No cache in dev, 1 year in prod with versioning
 )
 
-# Configure paths - use local paths for development, Docker paths for production
-if os.environ.get('FLASK_ENV') == 'production' or os.path.exists('/app'):
-    # Docker/production environment
-    app.config['UPLOAD_FOLDER'] = '/app/data/uploads'
-    app.config['SAVED_PLANS_FOLDER'] = '/app/data/saved_plans'
+# Gzip plan responses (segments + elevation profile JSON compresses ~10x); static
+# files are served by WhiteNoise and are not affected
+if compress_available:
+    app.config['COMPRESS_ALGORITHM'] = 'gzip'
+    app.config['COMPRESS_LEVEL'] = 6
+    app.config['COMPRESS_MIN_SIZE'] = 1024
+    app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json', 'text/csv']
+    Compress(app)
+
+# Configure paths from the environment: FUELPLAN_DATA_DIR holds uploads and saved
+# plans, KNOWN_RACES_DIR the bundled race GPX files (the Docker image sets both).
+# Without them, use Docker paths for production and local paths for development.
+if os.environ.get('FLASK_ENV') == 'production':
+    default_data_dir = '/app/data'
     # Known races are in a static location not affected by volume mounts
-    app.config['KNOWN_RACES_FOLDER'] = '/app/static_data/known_races'
+    default_known_races_dir = '/app/static_data/known_races'
 else:
-    # Local development environment
-    app.config['UPLOAD_FOLDER'] = os.path.join(os.getcwd(), 'FuelPlanData', 'uploads')
-    app.config['SAVED_PLANS_FOLDER'] = os.path.join(os.getcwd(), 'FuelPlanData', 'saved_plans')
+    default_data_dir = os.path.join(os.getcwd(), 'FuelPlanData')
     # For local dev, check both data/ (source of truth) and FuelPlanData/ (legacy)
-    if os.path.exists(os.path.join(os.getcwd(), 'data', 'known_races')):
-        app.config['KNOWN_RACES_FOLDER'] = os.path.join(os.getcwd(), 'data', 'known_races')
-    else:
-        app.config['KNOWN_RACES_FOLDER'] = os.path.join(os.getcwd(), 'FuelPlanData', 'known_races')
+    default_known_races_dir = os.path.join(os.getcwd(), 'data', 'known_races')
+    if not os.path.exists(default_known_races_dir):
+        default_known_races_dir = os.path.join(default_data_dir, 'known_races')
+
+data_dir = os.environ.get('FUELPLAN_DATA_DIR', default_data_dir)
+app.config['UPLOAD_FOLDER'] = os.path.join(data_dir, 'uploads')
+app.config['SAVED_PLANS_FOLDER'] = os.path.join(data_dir, 'saved_plans')
+app.config['KNOWN_RACES_FOLDER'] = os.environ.get('KNOWN_RACES_DIR', default_known_races_dir)
 
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
@@ -280,22 +330,111 @@ TERRAIN_GRADIENT_GAMMA = 1.25  # Between 1.0-1.5 as recommended
 TERRAIN_CLIMB_FACTOR = 0.7     # 70% effect on climbs
 TERRAIN_DESCENT_FACTOR = 1.0   # 100% effect on descents
 
+# Terrain caps on downhill speed gains (fraction of the gradient speed-up kept)
+TERRAIN_DOWNHILL_CAPS = {
+    'road': 1.0,              # Full speed possible
+    'smooth_trail': 0.95,     # Slight reduction
+    'dirt_road': 0.90,        # More caution needed
+    'rocky_runnable': 0.80,   # Significant caution
+    'technical': 0.70,        # Must slow considerably
+    'very_technical': 0.60,   # Very slow descent
+    'scrambling': 0.50        # Extremely slow descent
+}
+
+# Climbing efficiency vs gradient (%) as a piecewise-linear curve: the same
+# ladder as calculate_vertical_speed, flat at 90% below 3% and 70% above 25%
+VERTICAL_EFFICIENCY_GRADIENTS = np.array([0.0, 3.0, 6.0, 12.0, 18.0, 25.0])
+VERTICAL_EFFICIENCY_VALUES = np.array([0.90, 0.90, 0.95, 1.0, 0.85, 0.70])
+
+# Integer ids for terrain types, used to index the per-terrain lookup tables
+# below; the extra last row holds the defaults for unknown terrain types
+TERRAIN_IDS = {terrain_type: i for i, terrain_type in enumerate(TERRAIN_FACTORS)}
+UNKNOWN_TERRAIN_ID = len(TERRAIN_IDS)
+TERRAIN_FACTOR_TABLE = np.array([*TERRAIN_FACTORS.values(), 1.0])
+TERRAIN_DOWNHILL_CAP_TABLE = np.array([*(TERRAIN_DOWNHILL_CAPS[t] for t in TERRAIN_IDS), 0.90])
+
+# Degrees to radians (same factor math.radians uses)
+_DEG2RAD = math.pi / 180.0
+
+# GPX element local names read by parse_gpx_file
+GPX_POINT_TAGS = frozenset({'trkpt', 'rtept'})
+GPX_ELEVATION_TAG = 'ele'
+
+# Upper bound on points read from one GPX file, so a pathological upload cannot
+# make parsing run unbounded (a 100-mile race track is ~30k points)
+MAX_TRACKPOINTS = 500_000
+
+# Trackpoint hops shorter than this (|dlat| + |dlon| in radians, ~6 km) use the
+# equirectangular distance approximation; longer hops use the full haversine
+EQUIRECTANGULAR_MAX_SPAN_RAD = 0.001
+
+# Approximate number of points sent to the client for the elevation chart
+ELEVATION_PROFILE_MAX_POINTS = 500
+
 
 # Authentication Helper Functions
-def get_user_from_token(auth_header):
-    """Extract and validate user from authorization header."""
+
+# Successfully validated bearer tokens, so a burst of requests from one session
+# makes a single Supabase round-trip. Entries are keyed by a BLAKE2b digest (raw
+# tokens are not kept) and hold (expires_at, user); they expire after
+# TOKEN_CACHE_TTL_SECONDS, or earlier if the token itself expires.
+TOKEN_CACHE_TTL_SECONDS = 60
+TOKEN_CACHE_MAX_ENTRIES = 10_000
+token_cache = {}
+token_cache_lock = threading.Lock()
+
+def jwt_expiry_time(token):
+    """The 'exp' claim (Unix time) of a JWT, or None if it cannot be read. Not verified."""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(orjson.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except Exception:
+        return None
+
+def cache_validated_token(cache_key, token, user):
+    """Remember a validated token's user until the cache TTL or the token expires."""
+    now = time.time()
+    expires_at = now + TOKEN_CACHE_TTL_SECONDS
+    token_expires_at = jwt_expiry_time(token)
+    if token_expires_at is not None:
+        expires_at = min(expires_at, token_expires_at)
+    with token_cache_lock:
+        if len(token_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+            for key in [key for key, (entry_expires_at, _) in token_cache.items() if entry_expires_at <= now]:
+                del token_cache[key]
+            if len(token_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+                token_cache.clear()
+        token_cache[cache_key] = (expires_at, user)
+
+def get_user_from_token(auth_header, client=None):
+    """
+    Extract and validate user from authorization header.
+    
+    client is the Supabase client to validate with; it is looked up if not given.
+    """
+    if not SUPABASE_READY:
+        return None
     if not auth_header or not auth_header.startswith('Bearer '):
         log_message(f"   Invalid auth header format")
         return None
     
     # Get the client (creates it lazily if needed)
-    client = get_supabase_client()
+    if client is None:
+        client = get_supabase_client()
     if not client:
         log_message(f"   Failed to get supabase client")
         return None
     
     try:
         token = auth_header.replace('Bearer ', '')
+        cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        with token_cache_lock:
+            cached = token_cache.get(cache_key)
+        if cached and cached[0] > time.time():
+            log_message(f"   Token validated from cache")
+            return cached[1]
+        
         log_message(f"   Validating token (length: {len(token)})")
         user = client.auth.get_user(token)
         log_message(f"   Token validation successful: {bool(user)}")
@@ -303,6 +442,9 @@ def get_user_from_token(auth_header):
             log_message(f"   User object has .user attribute: {hasattr(user, 'user')}")
             if hasattr(user, 'user'):
                 log_message(f"   user.user value: {user.user}")
+            # Only successful validations are cached; failures are retried next request
+            if getattr(user, 'user', None):
+                cache_validated_token(cache_key, token, user)
         return user
     except Exception as e:
         log_message(f"   ❌ Error validating token: {e}")
@@ -325,7 +467,7 @@ def get_user_id_from_request():
         client = get_supabase_client()
         if client:
             log_message(f"   Attempting to validate token...")
-            user = get_user_from_token(auth_header)
+            user = get_user_from_token(auth_header, client)
             log_message(f"   Token validation result: {user}")
             if user and hasattr(user, 'user') and user.user:
                 log_message(f"   ✓ Authenticated user found: {user.user.id}")
@@ -363,12 +505,12 @@ def is_supabase_enabled():
     """Check if Supabase is properly configured."""
     # Check if we have credentials, not if client is initialized
     # This allows frontend to handle connection even if backend client failed
-    return SUPABASE_URL is not None and SUPABASE_ANON_KEY is not None
+    return SUPABASE_READY
 
 def get_supabase_client():
     """Get or create the Supabase client."""
     global supabase_client
-    if supabase_client is None and is_supabase_enabled() and supabase_import_available:
+    if supabase_client is None and SUPABASE_READY:
         try:
             from supabase import create_client
             print(f"Attempting to create Supabase anon client with URL: {SUPABASE_URL}")
@@ -384,7 +526,7 @@ def get_supabase_client():
 def get_supabase_admin_client():
     """Get or create the Supabase admin client."""
     global supabase_admin_client
-    if supabase_admin_client is None and is_supabase_enabled() and supabase_import_available and SUPABASE_SERVICE_KEY:
+    if supabase_admin_client is None and SUPABASE_READY and SUPABASE_SERVICE_KEY:
         try:
             from supabase import create_client
             print(f"Attempting to create Supabase admin client with URL: {SUPABASE_URL}")
@@ -399,60 +541,63 @@ def get_supabase_admin_client():
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two points on earth in kilometers."""
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    sin, cos = math.sin, math.cos
+    lat1 *= _DEG2RAD
+    lon1 *= _DEG2RAD
+    lat2 *= _DEG2RAD
+    lon2 *= _DEG2RAD
     dlat = lat2 - lat1
     dlon = lon2 - lon1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     c = 2 * math.asin(math.sqrt(a))
     r = 6371
     return c * r
 
+# A route as parallel arrays: one float64 entry per trackpoint in each field
+Track = namedtuple('Track', ['lats', 'lons', 'elevs'])
+
 def parse_gpx_file(gpx_path):
-    """Parse GPX file and extract trackpoints."""
-    tree = ET.parse(gpx_path)
-    root = tree.getroot()
-    
-    namespace_dict = {}
-    if root.tag.startswith('{'):
-        ns = root.tag.split('}')[0].strip('{')
-        namespace_dict = {'ns': ns}
-    
-    trackpoints = []
-    trkpt_list = []
-    
-    if namespace_dict:
-        trkpt_list = root.findall('.//{%s}trkpt' % namespace_dict['ns'])
-        if not trkpt_list:
-            trkpt_list = root.findall('.//{%s}rtept' % namespace_dict['ns'])
-    
-    if not trkpt_list:
-        trkpt_list = root.findall('.//trkpt')
-        if not trkpt_list:
-            trkpt_list = root.findall('.//rtept')
-    
-    if not trkpt_list:
-        for elem in root.iter():
-            if elem.tag.endswith('trkpt') or elem.tag.endswith('rtept'):
-                trkpt_list.append(elem)
-    
-    for trkpt in trkpt_list:
-        lat_str = trkpt.get('lat')
-        lon_str = trkpt.get('lon')
-        if lat_str is None or lon_str is None:
-            continue  # Skip trackpoints without lat/lon
-        lat = float(lat_str)
-        lon = float(lon_str)
-        
-        ele_elem = None
-        if namespace_dict:
-            ele_elem = trkpt.find('{%s}ele' % namespace_dict['ns'])
-        if ele_elem is None:
-            ele_elem = trkpt.find('ele')
-        
-        elev = float(ele_elem.text) if ele_elem is not None and ele_elem.text else 0.0
-        trackpoints.append((lat, lon, elev))
-    
-    return trackpoints
+    """
+    Parse GPX file and extract trackpoints as a Track of NumPy arrays.
+    
+    The file is streamed with iterparse in a single pass and each point is
+    cleared once read, so the full document tree is never held in memory.
+    Tags are matched by local name, so any (or no) namespace is accepted.
+    Track points are used when present, otherwise route points.
+    Coordinates are collected in flat array('d') buffers rather than lists
+    of boxed floats, then copied once into the Track arrays. A point's <ele>
+    child ends before the point itself, so its value is picked up from the
+    same end-event stream instead of searching each point's children.
+    """
+    points = {tag: (array.array('d'), array.array('d'), array.array('d')) for tag in GPX_POINT_TAGS}
+    elev = None
+    
+    for _, elem in ET.iterparse(gpx_path):
+        tag = elem.tag.rpartition('}')[2]
+        if tag == GPX_ELEVATION_TAG:
+            if elev is None:  # First elevation of the point wins
+                elev = float(elem.text) if elem.text else 0.0
+            continue
+        if tag not in GPX_POINT_TAGS:
+            if tag == 'wpt':
+                elev = None  # Waypoint elevations are not route data
+            continue
+        
+        lat_str = elem.get('lat')
+        lon_str = elem.get('lon')
+        if lat_str is not None and lon_str is not None:  # Skip trackpoints without lat/lon
+            lats, lons, elevs = points[tag]
+            if len(lats) >= MAX_TRACKPOINTS:
+                raise ValueError(f'GPX file has more than {MAX_TRACKPOINTS} points')
+            lats.append(float(lat_str))
+            lons.append(float(lon_str))
+            elevs.append(elev if elev is not None else 0.0)
+        
+        elev = None
+        elem.clear()
+    
+    columns = points['trkpt'] if points['trkpt'][0] else points['rtept']
+    return Track(*(np.frombuffer(column, dtype=np.float64).copy() for column in columns))
 
 # ============================================================================
 # PERFORMANCE PREDICTION MODEL
@@ -589,65 +734,277 @@ def calculate_base_pace_from_performance(reference_distance_km, reference_time_m
     return base_pace
 
 
-def calculate_total_distance(trackpoints):
-    """Calculate total distance of route."""
-    total_distance = 0.0
-    for i in range(len(trackpoints) - 1):
-        lat1, lon1, _ = trackpoints[i]
-        lat2, lon2, _ = trackpoints[i + 1]
-        total_distance += haversine_distance(lat1, lon1, lat2, lon2)
-    return total_distance
+def calculate_segment_distances(track):
+    """
+    Calculate distances in kilometers between consecutive points of a route.
+    
+    Consecutive trackpoints are usually only metres apart, so the cheaper
+    equirectangular approximation is used (one cos and one hypot per segment
+    instead of the full haversine); at that scale its error is far below GPS
+    noise. Longer hops fall back to the exact haversine formula.
+    """
+    lat_r = np.radians(track.lats)
+    lon_r = np.radians(track.lons)
+    dlat = np.diff(lat_r)
+    dlon = np.diff(lon_r)
+    r = 6371
+    
+    x = dlon * np.cos((lat_r[:-1] + lat_r[1:]) / 2)
+    distances = np.hypot(x, dlat) * r
+    
+    long_hops = np.abs(dlat) + np.abs(dlon) > EQUIRECTANGULAR_MAX_SPAN_RAD
+    if long_hops.any():
+        lat1 = lat_r[:-1][long_hops]
+        lat2 = lat_r[1:][long_hops]
+        a = np.sin(dlat[long_hops] / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon[long_hops] / 2) ** 2
+        distances[long_hops] = 2 * np.arcsin(np.sqrt(a)) * r
+    
+    return distances
+
+def route_kernel(lat_r, lon_r, elevs, max_span, cum_dist, cum_gain, cum_loss):
+    """
+    Fill cumulative distance, gain and loss arrays in a single pass over the route.
+    
+    Same maths as calculate_segment_distances and elevation_prefix_sums, but
+    fused into one loop with no temporary arrays. Compiled with numba when it
+    is installed; compute_route uses the NumPy functions otherwise.
+    """
+    r = 6371.0
+    for i in range(1, len(lat_r)):
+        dlat = lat_r[i] - lat_r[i - 1]
+        dlon = lon_r[i] - lon_r[i - 1]
+        if abs(dlat) + abs(dlon) > max_span:
+            a = math.sin(dlat / 2) ** 2 + math.cos(lat_r[i - 1]) * math.cos(lat_r[i]) * math.sin(dlon / 2) ** 2
+            segment_dist = 2 * math.asin(math.sqrt(a)) * r
+        else:
+            x = dlon * math.cos((lat_r[i - 1] + lat_r[i]) / 2)
+            segment_dist = math.hypot(x, dlat) * r
+        cum_dist[i] = cum_dist[i - 1] + segment_dist
+        
+        elev_diff = elevs[i] - elevs[i - 1]
+        cum_gain[i] = cum_gain[i - 1] + max(elev_diff, 0.0)
+        cum_loss[i] = cum_loss[i - 1] + max(-elev_diff, 0.0)
+
+if numba_available:
+    # No fastmath: results must match the NumPy path exactly enough to pick the same checkpoints
+    route_kernel = njit(cache=True, boundscheck=False)(route_kernel)
 
-def find_checkpoint_indices(trackpoints, checkpoint_distances):
-    """Find trackpoint indices for checkpoints."""
-    cumulative_dist = 0.0
-    distances = [0.0]
+def compute_route(track):
+    """
+    Calculate cumulative distance, elevation gain and elevation loss at every trackpoint.
     
-    for i in range(len(trackpoints) - 1):
-        lat1, lon1, _ = trackpoints[i]
-        lat2, lon2, _ = trackpoints[i + 1]
-        cumulative_dist += haversine_distance(lat1, lon1, lat2, lon2)
-        distances.append(cumulative_dist)
+    Returns (cum_dist, cum_gain, cum_loss), each starting at 0.0.
+    """
+    if numba_available:
+        n = max(len(track.lats), 1)
+        cum_dist = np.zeros(n)
+        cum_gain = np.zeros(n)
+        cum_loss = np.zeros(n)
+        route_kernel(np.radians(track.lats), np.radians(track.lons), track.elevs,
+                     EQUIRECTANGULAR_MAX_SPAN_RAD, cum_dist, cum_gain, cum_loss)
+        return cum_dist, cum_gain, cum_loss
+    
+    cum_dist = np.concatenate(([0.0], np.cumsum(calculate_segment_distances(track))))
+    cum_gain, cum_loss = elevation_prefix_sums(track.elevs)
+    return cum_dist, cum_gain, cum_loss
+
+def find_nearest_distance_indices(distances, target_distances):
+    """
+    Find the index of the closest cumulative distance for each target distance.
     
-    checkpoint_indices = [0]
+    Uses a binary search on the (non-decreasing) cumulative distance array.
+    Ties resolve to the lowest index, matching a linear scan for the minimum.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    target_distances = np.asarray(target_distances, dtype=np.float64)
+    last_idx = len(distances) - 1
     
-    for cp_dist in checkpoint_distances:
-        closest_idx = min(range(len(distances)), 
-                         key=lambda i: abs(distances[i] - cp_dist))
-        checkpoint_indices.append(closest_idx)
+    right = np.clip(np.searchsorted(distances, target_distances), 0, last_idx)
+    left = np.clip(right - 1, 0, last_idx)
+    # Repeated distances (e.g. GPS pauses) resolve to their first occurrence
+    left = np.searchsorted(distances, distances[left])
     
-    checkpoint_indices.append(len(trackpoints) - 1)
+    pick_left = np.abs(distances[left] - target_distances) <= np.abs(distances[right] - target_distances)
+    return np.where(pick_left, left, right)
+
+def find_checkpoint_indices(cum_dist, checkpoint_distances):
+    """Find trackpoint indices for checkpoints from the cumulative route distances."""
+    checkpoint_indices = [0]
+    checkpoint_indices.extend(find_nearest_distance_indices(cum_dist, checkpoint_distances).tolist())
+    checkpoint_indices.append(len(cum_dist) - 1)
     
-    return checkpoint_indices, distances
+    return checkpoint_indices, cum_dist
 
 def find_checkpoint_indices_from_profile(elevation_profile, checkpoint_distances):
     """Find checkpoint indices when using elevation profile data."""
     distances = [point['distance'] for point in elevation_profile]
     
     checkpoint_indices = [0]
-    
-    for cp_dist in checkpoint_distances:
-        closest_idx = min(range(len(distances)), 
-                         key=lambda i: abs(distances[i] - cp_dist))
-        checkpoint_indices.append(closest_idx)
-    
+    checkpoint_indices.extend(find_nearest_distance_indices(distances, checkpoint_distances).tolist())
     checkpoint_indices.append(len(elevation_profile) - 1)
     
     return checkpoint_indices, distances
 
-def calculate_elevation_change(trackpoints, start_idx, end_idx):
-    """Calculate elevation gain and loss between indices."""
-    gain = 0.0
-    loss = 0.0
+def elevation_prefix_sums(elevs):
+    """
+    Calculate cumulative elevation gain and loss at every trackpoint.
     
-    for i in range(start_idx, end_idx):
-        elev_change = trackpoints[i + 1][2] - trackpoints[i][2]
-        if elev_change > 0:
-            gain += elev_change
+    Both arrays start at 0.0, so the gain between two trackpoints is
+    cum_gain[end_idx] - cum_gain[start_idx] (likewise for loss).
+    """
+    elev_diff = np.diff(elevs)
+    cum_gain = np.concatenate(([0.0], np.cumsum(np.where(elev_diff > 0, elev_diff, 0.0))))
+    cum_loss = np.concatenate(([0.0], np.cumsum(np.where(elev_diff < 0, -elev_diff, 0.0))))
+    return cum_gain, cum_loss
+
+def calculate_elevation_change(cum_gain, cum_loss, start_idx, end_idx):
+    """Calculate elevation gain and loss between indices."""
+    gain = float(cum_gain[end_idx] - cum_gain[start_idx])
+    loss = float(cum_loss[end_idx] - cum_loss[start_idx])
+    return gain, loss
+
+def simplify_elevation_profile(cum_dist, elevs, max_points=ELEVATION_PROFILE_MAX_POINTS):
+    """
+    Pick at most max_points trackpoint indices that keep the shape of the profile.
+    
+    Half of the points are spread evenly along the route, so checkpoints can
+    still be snapped to a nearby point when the profile is sent back for a
+    recalculation, and the highest and lowest points are always kept. The
+    rest are added Douglas-Peucker style: the span whose elevation strays
+    furthest from the straight line between its end points is split at that
+    point, largest error first, so peaks and valleys that fall between the
+    even samples are kept.
+    """
+    # Sized on elevs: compute_route gives an empty track a cum_dist of [0.0]
+    num_points = len(elevs)
+    if num_points <= max_points:
+        return np.arange(num_points)
+    
+    seeds = np.unique(np.concatenate((
+        np.linspace(0, num_points - 1, max(2, max_points // 2)).round().astype(np.intp),
+        [np.argmax(elevs), np.argmin(elevs)]
+    )))
+    kept = set(seeds.tolist())
+    
+    def span_error(start, end):
+        if end - start < 2:
+            return None
+        inner = slice(start + 1, end)
+        span = cum_dist[end] - cum_dist[start]
+        if span > 0:
+            fraction = (cum_dist[inner] - cum_dist[start]) / span
         else:
-            loss += abs(elev_change)
+            fraction = np.linspace(0.0, 1.0, end - start + 1)[1:-1]
+        error = np.abs(elevs[inner] - (elevs[start] + fraction * (elevs[end] - elevs[start])))
+        split = int(np.argmax(error))
+        if error[split] < 0.05:  # Below the 0.1 m rounding of the profile
+            return None
+        return (-float(error[split]), start, end, start + 1 + split)
+    
+    heap = [entry for entry in map(span_error, seeds[:-1].tolist(), seeds[1:].tolist()) if entry]
+    heapq.heapify(heap)
+    while heap and len(kept) < max_points:
+        _, start, end, split = heapq.heappop(heap)
+        kept.add(split)
+        for entry in (span_error(start, split), span_error(split, end)):
+            if entry:
+                heapq.heappush(heap, entry)
+    
+    return np.array(sorted(kept), dtype=np.intp)
+
+def build_elevation_profile(cum_dist, elevs, max_points=ELEVATION_PROFILE_MAX_POINTS):
+    """
+    Build the elevation chart points from the route arrays.
     
-    return gain, loss
+    Long routes are reduced to max_points with simplify_elevation_profile. The
+    selection is done on the arrays, so dicts are only created for the points
+    returned.
+    """
+    indices = simplify_elevation_profile(cum_dist, elevs, max_points)
+    return [{'distance': round(distance, 3), 'elevation': round(elev, 1)}
+            for distance, elev in zip(cum_dist[indices].tolist(), elevs[indices].tolist())]
+
+def gpx_cache_path(gpx_path):
+    """Path of the .npz sidecar that caches the parsed arrays of a GPX file."""
+    return os.path.splitext(gpx_path)[0] + '.npz'
+
+def load_gpx_track(gpx_path, mtime_ns=None, size=None):
+    """
+    Load a GPX file as NumPy arrays, using the .npz sidecar cache when fresh.
+    
+    mtime_ns and size identify the version of the file to load. They default
+    to a fresh stat; precompute_route passes its own cache key so both caches
+    agree on which version they hold.
+    
+    Returns (track, cum_dist, cum_gain, cum_loss). The sidecar records the
+    mtime and size the GPX file had when it was parsed, and is only used while
+    the file still has both. The file is stat'ed once, before parsing, so a
+    re-upload that lands mid-parse leaves a sidecar that no longer matches
+    rather than one that passes for the new file. Failing to write the cache
+    (e.g. a read-only known races folder) is not an error; the file is simply
+    parsed again next time.
+    """
+    cache_path = gpx_cache_path(gpx_path)
+    if mtime_ns is None or size is None:
+        gpx_stat = os.stat(gpx_path)
+        mtime_ns, size = gpx_stat.st_mtime_ns, gpx_stat.st_size
+    try:
+        with np.load(cache_path) as cached:
+            if int(cached['source_mtime_ns']) == mtime_ns and int(cached['source_size']) == size:
+                track = Track(*(cached[name] for name in Track._fields))
+                return track, cached['cum_dist'], cached['cum_gain'], cached['cum_loss']
+    except Exception:
+        pass  # Missing, stale or unreadable cache: parse the GPX file
+    
+    track = parse_gpx_file(gpx_path)
+    cum_dist, cum_gain, cum_loss = compute_route(track)
+    
+    # Write to a temporary file first so other workers never see a partial cache
+    # (named per process and thread, since gunicorn runs threaded workers)
+    tmp_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **track._asdict(), cum_dist=cum_dist, cum_gain=cum_gain, cum_loss=cum_loss,
+                     source_mtime_ns=mtime_ns, source_size=size)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    
+    return track, cum_dist, cum_gain, cum_loss
+
+@lru_cache(maxsize=32)
+def precompute_route(gpx_path, mtime_ns, size):
+    """
+    In-process cache of load_gpx_track, so re-planning the same route with a
+    different pace or nutrition target skips even the .npz load.
+    
+    The file's mtime and size are the cache key, the same key the .npz
+    sidecar is checked against, so a re-uploaded file is loaded again once
+    either changes. A re-upload of the same size within one mtime tick is
+    not detected. The cached arrays are shared between requests and are made
+    read-only.
+    """
+    route = load_gpx_track(gpx_path, mtime_ns, size)
+    for values in (*route[0], *route[1:]):
+        values.setflags(write=False)
+    return route
+
+def load_route(gpx_path):
+    """Load a GPX route as (track, cum_dist, cum_gain, cum_loss) through the route cache."""
+    stat = os.stat(gpx_path)
+    return precompute_route(gpx_path, stat.st_mtime_ns, stat.st_size)
+
+# Route totals shown when a GPX file is uploaded or a known race is selected
+RouteSummary = namedtuple('RouteSummary', ['total_distance', 'total_elev_gain', 'total_elev_loss',
+                                           'num_trackpoints'])
+
+def load_route_summary(gpx_path):
+    """Totals for a GPX route, read off the cached prefix arrays without another pass."""
+    track, cum_dist, cum_gain, cum_loss = load_route(gpx_path)
+    return RouteSummary(float(cum_dist[-1]), float(cum_gain[-1]), float(cum_loss[-1]), len(track.lats))
 
 def calculate_terrain_efficiency_factor(terrain_type='smooth_trail', gradient=0.0, 
                                        skill_level=0.5, is_descent=False):
@@ -770,17 +1127,7 @@ def calculate_downhill_multiplier(gradient, terrain_type='smooth_trail', skill_l
     
     # Terrain limits maximum downhill speed
     # Novice runners are more cautious, experts can push limits
-    terrain_downhill_caps_base = {
-        'road': 1.0,              # Full speed possible
-        'smooth_trail': 0.95,     # Slight reduction
-        'dirt_road': 0.90,        # More caution needed
-        'rocky_runnable': 0.80,   # Significant caution
-        'technical': 0.70,        # Must slow considerably
-        'very_technical': 0.60,   # Very slow descent
-        'scrambling': 0.50        # Extremely slow descent
-    }
-    
-    base_terrain_cap = terrain_downhill_caps_base.get(terrain_type, 0.90)
+    base_terrain_cap = TERRAIN_DOWNHILL_CAPS.get(terrain_type, 0.90)
     
     # Skill level increases the terrain cap - experts can descend faster on technical terrain
     # skill_bonus ranges from 0 (novice) to 30% of remaining headroom (expert)
@@ -888,7 +1235,9 @@ def adjust_pace_for_elevation(base_pace, elevation_gain, elevation_loss, distanc
         # No fatigue penalty until cumulative effort exceeds FOP
         if cumulative_effort > fop:
             # Non-linear fatigue: fatigue_multiplier = 1 + α × ((E − FOP) / FOP)^β
-            fatigue_multiplier = 1.0 + alpha * (((cumulative_effort - fop) / fop) ** beta)
+            ratio = (cumulative_effort - fop) / fop
+            # β is 1.0 for untrained/recreational athletes: skip the pow() call
+            fatigue_multiplier = 1.0 + alpha * (ratio if beta == 1.0 else ratio ** beta)
     
     # === Combine all factors ===
     # segment_time = base_time × terrain_factor × fatigue_multiplier × skill_efficiency
@@ -907,13 +1256,137 @@ def adjust_pace_for_elevation(base_pace, elevation_gain, elevation_loss, distanc
     
     return final_pace, pace_with_climbing, fatigue_seconds_per_km, terrain_factor, pace_capped
 
-def format_time(minutes):
-    """Format minutes to HH:MM:SS."""
-    hours = int(minutes // 60)
-    mins = int(minutes % 60)
-    secs = int((minutes % 1) * 60)
+def adjust_paces_for_segments(base_pace, elevation_gains, elevation_losses, distances_km,
+                              terrain_types, climbing_ability='moderate',
+                              fatigue_enabled=True, fitness_level='recreational',
+                              skill_level=0.5):
+    """
+    Vectorized adjust_pace_for_elevation for every segment of a route at once.
+    
+    Fatigue depends on the cumulative effort before each segment, and effort
+    only depends on segment distance and elevation (not on time), so it is an
+    exclusive prefix sum and all segments can be computed in a single pass.
+    The maths is the same as the scalar model, segment for segment.
+    
+    Returns:
+        Tuple of arrays: (final_pace, base_pace_with_climbing, fatigue_seconds, terrain_factor, pace_capped)
+    """
+    gains = np.asarray(elevation_gains, dtype=np.float64)
+    losses = np.asarray(elevation_losses, dtype=np.float64)
+    dists = np.asarray(distances_km, dtype=np.float64)
+    terrain_ids = np.array([TERRAIN_IDS.get(t, UNKNOWN_TERRAIN_ID) for t in terrain_types], dtype=np.intp)
+    
+    # Effort before each segment: effort_km = distance_km + ascent_m/100 + descent_m/200
+    segment_effort = dists + (gains / 100.0) + (losses / 200.0)
+    cumulative_effort = np.zeros_like(segment_effort)
+    cumulative_effort[1:] = np.cumsum(segment_effort)[:-1]
+    
+    climb_params = CLIMBING_ABILITY_PARAMS.get(climbing_ability, CLIMBING_ABILITY_PARAMS['moderate'])
+    base_vertical_speed = climb_params['vertical_speed']
+    
+    # Zero-length segments keep the base pace (divide by 1.0 and mask out below)
+    moving = dists > 0
+    safe_dists = np.where(moving, dists, 1.0)
+    gradient = (gains - losses) / (safe_dists * 1000.0)
+    gradient_pct = np.abs(gradient) * 100.0
+    is_descent = losses > gains
+    
+    # 1. Horizontal movement time (minutes)
+    base_pace_kmh = 60.0 / base_pace
+    horizontal_time = (dists / base_pace_kmh) * 60.0
+    
+    # 2. Climbing time, with the gradient efficiency of calculate_vertical_speed
+    efficiency = np.interp(gradient_pct, VERTICAL_EFFICIENCY_GRADIENTS, VERTICAL_EFFICIENCY_VALUES)
+    steep_skill_bonus = skill_level * 0.05 * np.minimum(1.0, (gradient_pct - 12.0) / 13.0)
+    efficiency = np.where(gradient_pct > 12.0, np.minimum(1.0, efficiency + steep_skill_bonus), efficiency)
+    vertical_speed = base_vertical_speed * efficiency
+    climb_time = np.where(gains > 0, (gains / vertical_speed) * 60.0, 0.0)
+    
+    # 3. Descent time savings, with the multiplier of calculate_downhill_multiplier
+    base_multiplier = np.select(
+        [gradient_pct <= 5.0, gradient_pct <= 10.0, gradient_pct <= 15.0],
+        [1.05, 1.15, 1.20],
+        1.10
+    )
+    base_terrain_cap = TERRAIN_DOWNHILL_CAP_TABLE[terrain_ids]
+    terrain_cap = np.minimum(1.0, base_terrain_cap + skill_level * 0.3 * (1.0 - base_terrain_cap))
+    downhill_multiplier = np.where(gradient < 0, 1.0 + (base_multiplier - 1.0) * terrain_cap, 1.0)
+    descent_time_savings = np.where((losses > 0) & is_descent,
+                                    horizontal_time * (1.0 - 1.0 / downhill_multiplier), 0.0)
+    
+    base_segment_time = horizontal_time + climb_time - descent_time_savings
+    pace_with_climbing = base_segment_time / safe_dists
+    
+    # Terrain efficiency factor, as in calculate_terrain_efficiency_factor
+    base_terrain_factor = TERRAIN_FACTOR_TABLE[terrain_ids]
+    scaled_terrain_factor = base_terrain_factor * (1.0 + (TERRAIN_GRADIENT_GAMMA * np.abs(gradient)))
+    direction_factor = np.where(is_descent, TERRAIN_DESCENT_FACTOR, TERRAIN_CLIMB_FACTOR)
+    direction_adjusted_factor = 1.0 + (scaled_terrain_factor - 1.0) * direction_factor
+    terrain_factor = np.maximum(1.0, 1.0 + (direction_adjusted_factor - 1.0) * (1.0 - skill_level))
+    
+    skill_efficiency_bonus = 1.0 - (skill_level * 0.03)
+    
+    fatigue_multiplier = np.ones_like(dists)
+    if fatigue_enabled:
+        params = FITNESS_LEVEL_PARAMS.get(fitness_level, FITNESS_LEVEL_PARAMS['recreational'])
+        fop = params['fop']
+        excess = np.maximum(cumulative_effort - fop, 0.0) / fop
+        if params['beta'] != 1.0:
+            excess = excess ** params['beta']
+        fatigue_multiplier = np.where(cumulative_effort > fop, 1.0 + params['alpha'] * excess, 1.0)
+    
+    adjusted_segment_time = base_segment_time * terrain_factor * fatigue_multiplier * skill_efficiency_bonus
+    final_pace = adjusted_segment_time / safe_dists
+    fatigue_seconds_per_km = (pace_with_climbing * fatigue_multiplier - pace_with_climbing) * 60.0
+    
+    max_allowed_pace = base_pace * 2.5
+    pace_capped = moving & (final_pace > max_allowed_pace)
+    final_pace = np.where(pace_capped, max_allowed_pace, final_pace)
+    
+    return (np.where(moving, final_pace, base_pace),
+            np.where(moving, pace_with_climbing, base_pace),
+            np.where(moving, fatigue_seconds_per_km, 0.0),
+            np.where(moving, terrain_factor, 1.0),
+            pace_capped)
+
+@lru_cache(maxsize=8192)
+def format_seconds(total_seconds):
+    """Format whole seconds as HH:MM:SS (cached, durations repeat across plans)."""
+    hours, remainder = divmod(total_seconds, 3600)
+    mins, secs = divmod(remainder, 60)
     return f"{hours:02d}:{mins:02d}:{secs:02d}"
 
+def format_time(minutes):
+    """Format minutes to HH:MM:SS, rounded to the nearest second."""
+    return format_seconds(int(round(minutes * 60)))
+
+def format_pace(pace):
+    """Format a pace in min/km as M:SS, truncated to the whole second."""
+    return f"{int(pace)}:{int((pace % 1) * 60):02d}"
+
+def format_fatigue(fatigue_seconds):
+    """Format the fatigue time added to a segment as +M:SS."""
+    return f"+{int(fatigue_seconds // 60)}:{int(fatigue_seconds % 60):02d}"
+
+def calculate_times_of_day(race_start_time, cumulative_minutes):
+    """
+    Clock time ("HH:MM") reached after each cumulative duration from the race start.
+    
+    All times are computed in one pass with datetime64 arithmetic. Returns None
+    for every entry when race_start_time ("HH:MM") is missing or invalid.
+    """
+    if not race_start_time:
+        return [None] * len(cumulative_minutes)
+    try:
+        start_hours, start_minutes = map(int, race_start_time.split(':'))
+    except (ValueError, AttributeError):
+        return [None] * len(cumulative_minutes)
+    
+    start = np.datetime64('2000-01-01T00:00') + np.timedelta64(start_hours * 60 + start_minutes, 'm')
+    # Whole seconds, rounded like format_time, so a finish at 07:59:59.99 reads as 08:00
+    elapsed = np.rint(np.asarray(cumulative_minutes, dtype=np.float64) * 60).astype('timedelta64[s]')
+    return [clock[-5:] for clock in np.datetime_as_string(start + elapsed, unit='m').tolist()]
+
 def calculate_dropbag_contents(segments, checkpoint_dropbags, carbs_per_serving=None):
     """
     Calculate dropbag contents for each checkpoint with a dropbag, plus starting supplies.
@@ -963,51 +1436,42 @@ def calculate_dropbag_contents(segments, checkpoint_dropbags, carbs_per_serving=
     if not checkpoint_dropbags or len(checkpoint_dropbags) == 0:
         return dropbag_contents
     
-    # Build a mapping of checkpoint index to their dropbag contents
-    # dropbag_accumulation[cp_index] = {'carbs': X, 'hydration': Y}
-    dropbag_accumulation = {}
-    
-    # Initialize dropbag checkpoints
-    for i, has_dropbag in enumerate(checkpoint_dropbags):
-        if has_dropbag:
-            dropbag_accumulation[i] = {'carbs': 0, 'hydration': 0.0}
+    # Checkpoints with a dropbag, and for each checkpoint the index of the last
+    # dropbag checkpoint at or before it (-1 if none yet)
+    has_dropbag = np.array([bool(flag) for flag in checkpoint_dropbags])
     
     # If no dropbags are checked, return only Start
-    if not dropbag_accumulation:
+    if not has_dropbag.any():
         return dropbag_contents
     
-    # Iterate through segments and accumulate nutrition
+    num_checkpoints = len(has_dropbag)
+    last_dropbag = np.maximum.accumulate(np.where(has_dropbag, np.arange(num_checkpoints), -1))
+    
     # Segments: Start -> CP1 (seg 0), CP1 -> CP2 (seg 1), ..., CPn -> Finish (seg n)
-    for seg_idx, segment in enumerate(segments):
-        # Skip the first segment (Start -> CP1) - already handled above
-        if seg_idx == 0:
-            continue
-        
-        # seg_idx corresponds to: seg 1 = CP1->CP2, seg 2 = CP2->CP3, etc.
-        # The checkpoint that would carry this segment's nutrition is at index seg_idx - 1
-        checkpoint_idx = seg_idx - 1
-        
-        # Find the last checkpoint with a dropbag at or before this checkpoint
-        target_dropbag_cp = None
-        for i in range(checkpoint_idx, -1, -1):
-            if i in dropbag_accumulation:
-                target_dropbag_cp = i
-                break
-        
-        # If we found a dropbag checkpoint, accumulate this segment's nutrition
-        if target_dropbag_cp is not None:
-            dropbag_accumulation[target_dropbag_cp]['carbs'] += segment['target_carbs']
-            dropbag_accumulation[target_dropbag_cp]['hydration'] += segment['target_water']
+    # Segment seg_idx >= 1 departs from checkpoint seg_idx - 1 and is carried from
+    # the last dropbag at or before that checkpoint. Segments past the last listed
+    # checkpoint fall back to the last dropbag overall.
+    departure_cps = np.minimum(np.arange(len(segments) - 1), num_checkpoints - 1)
+    target_dropbags = last_dropbag[departure_cps]
+    carried = target_dropbags >= 0
+    target_dropbags = target_dropbags[carried]
+    
+    # Group-sum each segment's nutrition into its dropbag in one pass. bincount adds
+    # weights in segment order, so the sums match a running total exactly.
+    later_segments = segments[1:]
+    carbs = np.array([segment['target_carbs'] for segment in later_segments], dtype=np.float64)
+    water = np.array([segment['target_water'] for segment in later_segments], dtype=np.float64)
+    dropbag_carbs = np.bincount(target_dropbags, weights=carbs[carried], minlength=num_checkpoints)
+    dropbag_water = np.bincount(target_dropbags, weights=water[carried], minlength=num_checkpoints)
     
     # Convert to output format
-    for cp_idx in sorted(dropbag_accumulation.keys()):
-        contents = dropbag_accumulation[cp_idx]
-        carb_target = round(contents['carbs'])  # Round to whole grams
+    for cp_idx in np.flatnonzero(has_dropbag).tolist():
+        carb_target = round(float(dropbag_carbs[cp_idx]))  # Round to whole grams
         
         dropbag_item = {
             'checkpoint': f'CP{cp_idx + 1}',
             'carbs': carb_target,
-            'hydration': round(contents['hydration'], 1)
+            'hydration': round(float(dropbag_water[cp_idx]), 1)
         }
         
         # Add serving calculations if carbs_per_serving is provided
@@ -1045,31 +1509,30 @@ def upload_gpx():
     if not file.filename.endswith('.gpx'):
         return jsonify({'error': 'File must be a GPX file'}), 400
     
+    # Reject obviously non-XML content before anything is written to disk
+    head = file.stream.read(512)
+    file.stream.seek(0)
+    if b'<' not in head:
+        return jsonify({'error': 'File is not a valid GPX (XML) file'}), 400
+    
     filename = secure_filename(file.filename)
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
+    # Stream to a temporary file and swap it in, so requests reading a previous
+    # upload with the same name never see a partially written file
+    tmp_path = f'{filepath}.{os.getpid()}.{threading.get_ident()}.tmp'
+    file.save(tmp_path, buffer_size=64 * 1024)
+    os.replace(tmp_path, filepath)
     
     try:
-        trackpoints = parse_gpx_file(filepath)
-        total_distance = calculate_total_distance(trackpoints)
-        
-        # Calculate total elevation
-        total_elev_gain = 0.0
-        total_elev_loss = 0.0
-        for i in range(len(trackpoints) - 1):
-            elev_change = trackpoints[i + 1][2] - trackpoints[i][2]
-            if elev_change > 0:
-                total_elev_gain += elev_change
-            else:
-                total_elev_loss += abs(elev_change)
+        summary = load_route_summary(filepath)
         
         return jsonify({
             'filename': filename,
-            'total_distance': round(total_distance, 2),
-            'total_distance_miles': round(total_distance * 0.621371, 2),
-            'total_elev_gain': round(total_elev_gain, 0),
-            'total_elev_loss': round(total_elev_loss, 0),
-            'num_trackpoints': len(trackpoints)
+            'total_distance': round(summary.total_distance, 2),
+            'total_distance_miles': round(summary.total_distance * 0.621371, 2),
+            'total_elev_gain': round(summary.total_elev_gain, 0),
+            'total_elev_loss': round(summary.total_elev_loss, 0),
+            'num_trackpoints': summary.num_trackpoints
         })
     except Exception as e:
         return jsonify({'error': f'Error parsing GPX file: {str(e)}'}), 400
@@ -1246,30 +1709,19 @@ def load_known_race(filename):
         if not os.path.exists(filepath):
             return jsonify({'error': 'Known race file not found'}), 404
         
-        # Parse the GPX file
-        trackpoints = parse_gpx_file(filepath)
-        total_distance = calculate_total_distance(trackpoints)
-        
-        # Calculate total elevation
-        total_elev_gain = 0.0
-        total_elev_loss = 0.0
-        for i in range(len(trackpoints) - 1):
-            elev_change = trackpoints[i + 1][2] - trackpoints[i][2]
-            if elev_change > 0:
-                total_elev_gain += elev_change
-            else:
-                total_elev_loss += abs(elev_change)
+        # Load the route totals
+        summary = load_route_summary(filepath)
         
         # Parse metadata from filename
         metadata = parse_known_race_filename(filename)
         
         return jsonify({
             'filename': secure_name,
-            'total_distance': round(total_distance, 2),
-            'total_distance_miles': round(total_distance * 0.621371, 2),
-            'total_elev_gain': round(total_elev_gain, 0),
-            'total_elev_loss': round(total_elev_loss, 0),
-            'num_trackpoints': len(trackpoints),
+            'total_distance': round(summary.total_distance, 2),
+            'total_distance_miles': round(summary.total_distance * 0.621371, 2),
+            'total_elev_gain': round(summary.total_elev_gain, 0),
+            'total_elev_loss': round(summary.total_elev_loss, 0),
+            'num_trackpoints': summary.num_trackpoints,
             'metadata': metadata,
             'is_known_race': True
         })
@@ -1504,7 +1956,7 @@ def calculate_independent_target_pacing(target_time_minutes, segments_data):
     log_message(f"Total distance: {total_distance_km:.2f} km")
     log_message(f"Neutral route cost: {neutral_cost:.2f} km-equivalent")
     log_message(f"Neutral reference pace: {neutral_reference_pace:.2f} min/km (internal, terrain-adjusted)")
-    log_message(f"Simple flat pace: {flat_pace:.2f} min/km ({int(flat_pace)}:{int((flat_pace % 1) * 60):02d}) (for UI display)")
+    log_message(f"Simple flat pace: {flat_pace:.2f} min/km ({format_pace(flat_pace)}) (for UI display)")
     log_message(f"Pace limits: {MIN_PACE:.2f}-{MAX_PACE:.2f} min/km")
     
     # ========================================
@@ -2209,14 +2661,30 @@ def calculate_effort_thresholds(natural_results, segments_data, base_pace, climb
     return result
 
 
-@app.route('/api/calculate', methods=['POST'])
-def calculate():
-    """Calculate race plan."""
+def plan_gpx_path(data):
+    """Path of the GPX file a plan request refers to, or None if no file is named."""
+    filename = data.get('gpx_filename')
+    if not filename:
+        return None
+    
+    # Sanitize filename to prevent path traversal
+    filename = secure_filename(filename)
+    
+    # Check if this is a known race or user-uploaded file
+    if data.get('is_known_race', False):
+        # Look for file in known races folder
+        return os.path.join(app.config['KNOWN_RACES_FOLDER'], filename)
+    # Look for file in upload folder
+    return os.path.join(app.config['UPLOAD_FOLDER'], filename)
+
+def calculate_plan(data):
+    """
+    Calculate a race plan from the /api/calculate request body.
+    
+    Returns (response_data, status); errors are returned as {'error': message}
+    with a 400 status.
+    """
     try:
-        data = request.json
-        if data is None:
-            return jsonify({'error': 'Invalid JSON data'}), 400
-        
         # Parse inputs
         checkpoint_distances = data.get('checkpoint_distances', [])
         checkpoint_dropbags = data.get('checkpoint_dropbags', [])  # New: dropbag status
@@ -2224,7 +2692,7 @@ def calculate():
         # Validate maximum number of checkpoints
         MAX_CHECKPOINTS = 30
         if len(checkpoint_distances) > MAX_CHECKPOINTS:
-            return jsonify({'error': f'Maximum number of checkpoints is {MAX_CHECKPOINTS}. You provided {len(checkpoint_distances)} checkpoints.'}), 400
+            return {'error': f'Maximum number of checkpoints is {MAX_CHECKPOINTS}. You provided {len(checkpoint_distances)} checkpoints.'}, 400
         
         segment_terrain_types = data.get('segment_terrain_types', [])
         avg_cp_time = float(data.get('avg_cp_time', 5))
@@ -2256,12 +2724,9 @@ def calculate():
         
         if elevation_profile_data:
             # Use provided elevation profile instead of parsing GPX
-            # Reconstruct trackpoints from elevation profile for elevation calculations
-            trackpoints = []
-            for point in elevation_profile_data:
-                # Create trackpoints with elevation data
-                # Note: lat/lon are dummy values (0.0, 0.0) - only elevation is used
-                trackpoints.append((0.0, 0.0, point['elevation']))
+            # Only elevation is needed from the profile for elevation calculations
+            elevs = np.array([point['elevation'] for point in elevation_profile_data], dtype=np.float64)
+            cum_gain, cum_loss = elevation_prefix_sums(elevs)
             
             # Calculate total distance from the elevation profile
             total_distance = elevation_profile_data[-1]['distance']
@@ -2270,33 +2735,19 @@ def calculate():
             checkpoint_indices, distances = find_checkpoint_indices_from_profile(elevation_profile_data, checkpoint_distances)
         else:
             # Get uploaded GPX file and parse it
-            filename = data.get('gpx_filename')
-            if not filename:
-                return jsonify({'error': 'No GPX file specified'}), 400
-            
-            # Sanitize filename to prevent path traversal
-            from werkzeug.utils import secure_filename
-            filename = secure_filename(filename)
-            
-            # Check if this is a known race or user-uploaded file
-            is_known_race = data.get('is_known_race', False)
-            
-            if is_known_race:
-                # Look for file in known races folder
-                filepath = os.path.join(app.config['KNOWN_RACES_FOLDER'], filename)
-            else:
-                # Look for file in upload folder
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            filepath = plan_gpx_path(data)
+            if filepath is None:
+                return {'error': 'No GPX file specified'}, 400
             
             if not os.path.exists(filepath):
-                return jsonify({'error': 'GPX file not found'}), 400
+                return {'error': 'GPX file not found'}, 400
             
             # Parse GPX
-            trackpoints = parse_gpx_file(filepath)
-            total_distance = calculate_total_distance(trackpoints)
+            track, cum_dist, cum_gain, cum_loss = load_route(filepath)
+            total_distance = float(cum_dist[-1])
             
             # Find checkpoint indices using trackpoints
-            checkpoint_indices, distances = find_checkpoint_indices(trackpoints, checkpoint_distances)
+            checkpoint_indices, distances = find_checkpoint_indices(cum_dist, checkpoint_distances)
         
         # === Prepare segment data for calculations ===
         num_checkpoints = len(checkpoint_distances)
@@ -2306,13 +2757,14 @@ def calculate():
         segment_labels.append("Finish")
         
         # Build basic segment info (distance, elevation, terrain)
+        # Distances and elevation come from the cumulative arrays computed once above
         segments_basic_data = []
         for i in range(len(checkpoint_indices) - 1):
             start_idx = checkpoint_indices[i]
             end_idx = checkpoint_indices[i + 1]
             
-            segment_dist = distances[end_idx] - distances[start_idx]
-            elev_gain, elev_loss = calculate_elevation_change(trackpoints, start_idx, end_idx)
+            segment_dist = float(distances[end_idx] - distances[start_idx])
+            elev_gain, elev_loss = calculate_elevation_change(cum_gain, cum_loss, start_idx, end_idx)
             terrain_type = segment_terrain_types[i] if i < len(segment_terrain_types) else 'smooth_trail'
             
             segments_basic_data.append({
@@ -2350,7 +2802,7 @@ def calculate():
                     log_message(f"Target moving time: {target_moving_time:.2f} min")
                     
                     if target_moving_time <= 0:
-                        return jsonify({'error': f'Target time ({target_time_str}) is too short - checkpoint stops alone require {total_cp_time:.1f} minutes'}), 400
+                        return {'error': f'Target time ({target_time_str}) is too short - checkpoint stops alone require {total_cp_time:.1f} minutes'}, 400
                     
                     # Use NEW independent target time calculation
                     # This ignores base pace, fitness, fatigue, and technical ability
@@ -2360,21 +2812,40 @@ def calculate():
                     )
                     log_message(f"✓ Independent calculation complete. Results count: {len(reverse_results)}")
                 else:
-                    return jsonify({'error': 'Invalid target time format. Use HH:MM:SS'}), 400
+                    return {'error': 'Invalid target time format. Use HH:MM:SS'}, 400
             except Exception as e:
                 log_message(f"✗ Error in target time calculation: {str(e)}")
                 import traceback
                 traceback.print_exc()
-                return jsonify({'error': f'Error parsing target time: {str(e)}'}), 400
+                return {'error': f'Error parsing target time: {str(e)}'}, 400
         else:
             log_message(f"Using BASE PACE mode (not target time)")
         
+        # Forward-model paces for all segments in one vectorized pass
+        # (fatigue only depends on the effort of the preceding segments)
+        forward_paces = adjust_paces_for_segments(
+            z2_pace,
+            [seg['elev_gain'] for seg in segments_basic_data],
+            [seg['elev_loss'] for seg in segments_basic_data],
+            [seg['distance'] for seg in segments_basic_data],
+            [seg['terrain_type'] for seg in segments_basic_data],
+            climbing_ability, fatigue_enabled, fitness_level, skill_level
+        )
+        natural_paces, elev_adjusted_paces, fatigue_seconds_list, terrain_factors, paces_capped = (
+            values.tolist() for values in forward_paces
+        )
+        
         # Calculate segments with cumulative effort tracking
         segments = []
+        cumulative_times = []  # Unrounded elapsed time at each checkpoint arrival
         cumulative_time = 0.0
         total_moving_time = 0.0
         cumulative_effort = 0.0  # Track effort in km-effort
         cumulative_distance = 0.0  # Track cumulative distance
+        # Race totals, accumulated from the rounded per-segment values as they are built
+        total_elev_gain = 0
+        total_carbs = 0
+        total_water = 0
         
         for i in range(len(segments_basic_data)):
             seg_basic = segments_basic_data[i]
@@ -2396,10 +2867,8 @@ def calculate():
                 
                 # In new independent mode, we still calculate natural pace for display reference
                 # But it doesn't affect the results
-                _, elev_adjusted_pace, fatigue_seconds, terrain_factor, _ = adjust_pace_for_elevation(
-                    z2_pace, elev_gain, elev_loss, segment_dist, cumulative_effort, climbing_ability,
-                    fatigue_enabled, fitness_level, terrain_type, skill_level
-                )
+                elev_adjusted_pace = elev_adjusted_paces[i]
+                terrain_factor = terrain_factors[i]
                 
                 # No aggressive marking in new mode - effort level communicates difficulty
                 pace_aggressive = False
@@ -2411,10 +2880,11 @@ def calculate():
                 # Base Pace Mode: Use forward-calculated pace (prediction)
                 if i == 0:
                     log_message(f"\n>>> Using BASE PACE MODE for segment calculations")
-                adjusted_pace, elev_adjusted_pace, fatigue_seconds, terrain_factor, pace_capped = adjust_pace_for_elevation(
-                    z2_pace, elev_gain, elev_loss, segment_dist, cumulative_effort, climbing_ability,
-                    fatigue_enabled, fitness_level, terrain_type, skill_level
-                )
+                adjusted_pace = natural_paces[i]
+                elev_adjusted_pace = elev_adjusted_paces[i]
+                fatigue_seconds = fatigue_seconds_list[i]
+                terrain_factor = terrain_factors[i]
+                pace_capped = paces_capped[i]
                 segment_time = segment_dist * adjusted_pace
                 pace_aggressive = False
                 effort_level = 'steady'
@@ -2436,24 +2906,12 @@ def calculate():
                 cumulative_time += avg_cp_time
             
             cumulative_time += segment_time
+            cumulative_times.append(cumulative_time)
             
             segment_hours = segment_time / 60.0
             target_carbs = round((segment_hours * carbs_per_hour) / 10) * 10
             target_water_L = round((segment_hours * water_per_hour / 1000) * 10) / 10
             
-            # Calculate time of day
-            time_of_day = None
-            if race_start_time:
-                try:
-                    start_hours, start_minutes = map(int, race_start_time.split(':'))
-                    start_total_minutes = start_hours * 60 + start_minutes
-                    current_total_minutes = start_total_minutes + cumulative_time
-                    current_hours = int(current_total_minutes // 60) % 24
-                    current_mins = int(current_total_minutes % 60)
-                    time_of_day = f"{current_hours:02d}:{current_mins:02d}"
-                except:
-                    pass
-            
             # Calculate terrain penalty percentage for display
             terrain_penalty_pct = (terrain_factor - 1.0) * 100.0
             
@@ -2468,16 +2926,16 @@ def calculate():
                 'segment_effort': round(segment_effort, 2),
                 'cumulative_effort': round(cumulative_effort, 2),
                 'elev_pace': round(elev_adjusted_pace, 2),
-                'elev_pace_str': f"{int(elev_adjusted_pace)}:{int((elev_adjusted_pace % 1) * 60):02d}",
+                'elev_pace_str': format_pace(elev_adjusted_pace),
                 'pace': round(adjusted_pace, 2),
-                'pace_str': f"{int(adjusted_pace)}:{int((adjusted_pace % 1) * 60):02d}",
+                'pace_str': format_pace(adjusted_pace),
                 'pace_capped': pace_capped,
                 'pace_aggressive': pace_aggressive if use_target_time else False,
                 'effort_level': effort_level if use_target_time else 'steady',  # New: effort allocation
                 'flat_pace': round(flat_pace, 2) if flat_pace else None,  # Add flat pace for pace coloring in target time mode
                 # Note: In target time mode, fatigue is incorporated into natural pacing, not displayed separately
                 'fatigue_seconds': round(fatigue_seconds, 1) if not use_target_time else 0.0,
-                'fatigue_str': f"+{int(fatigue_seconds // 60)}:{int(fatigue_seconds % 60):02d}" if not use_target_time else "+0:00",
+                'fatigue_str': format_fatigue(fatigue_seconds) if not use_target_time else "+0:00",
                 'terrain_type': terrain_type,
                 'terrain_factor': round(terrain_factor, 3),
                 'terrain_penalty_pct': round(terrain_penalty_pct, 1),
@@ -2487,18 +2945,20 @@ def calculate():
                 'cumulative_time_str': format_time(cumulative_time),
                 'target_carbs': target_carbs,
                 'target_water': target_water_L,
-                'time_of_day': time_of_day
+                'time_of_day': None  # Filled in for all segments after the loop
             }
             
             if carbs_per_serving and carbs_per_serving > 0:
                 segment_data['num_servings'] = round(target_carbs / carbs_per_serving)
             
             segments.append(segment_data)
+            total_elev_gain += segment_data['elev_gain']
+            total_carbs += target_carbs
+            total_water += target_water_L
         
-        # Calculate totals
-        total_elev_gain = sum(s['elev_gain'] for s in segments)
-        total_carbs = sum(s['target_carbs'] for s in segments)
-        total_water = sum(s['target_water'] for s in segments)
+        # Time of day at each checkpoint arrival
+        for segment_data, time_of_day in zip(segments, calculate_times_of_day(race_start_time, cumulative_times)):
+            segment_data['time_of_day'] = time_of_day
         total_cp_time = avg_cp_time * num_checkpoints
         
         # In new independent target time mode, no warnings needed
@@ -2511,23 +2971,8 @@ def calculate():
             # Use the provided elevation profile (already has correct distance values)
             elevation_profile = elevation_profile_data
         else:
-            # Generate elevation profile from parsed GPX trackpoints
-            elevation_profile = []
-            cumulative_dist = 0.0
-            for i in range(len(trackpoints)):
-                if i > 0:
-                    lat1, lon1, _ = trackpoints[i - 1]
-                    lat2, lon2, _ = trackpoints[i]
-                    cumulative_dist += haversine_distance(lat1, lon1, lat2, lon2)
-                elevation_profile.append({
-                    'distance': round(cumulative_dist, 3),
-                    'elevation': round(trackpoints[i][2], 1)
-                })
-            
-            # Sample elevation data for performance (max 500 points)
-            if len(elevation_profile) > 500:
-                step = len(elevation_profile) // 500
-                elevation_profile = elevation_profile[::step]
+            # Generate elevation profile from parsed GPX trackpoints, sampled for performance
+            elevation_profile = build_elevation_profile(cum_dist, track.elevs)
         
         # Calculate dropbag contents
         dropbag_contents = calculate_dropbag_contents(segments, checkpoint_dropbags, carbs_per_serving)
@@ -2539,7 +2984,7 @@ def calculate():
             # Calculate flat-equivalent base pace for display
             total_distance_km = sum(seg['distance'] for seg in segments_basic_data)
             flat_pace = target_moving_time / total_distance_km if total_distance_km > 0 else 0
-            flat_pace_str = f"{int(flat_pace)}:{int((flat_pace % 1) * 60):02d}"
+            flat_pace_str = format_pace(flat_pace)
             
             effort_guidance = {
                 'flat_pace': round(flat_pace, 2),
@@ -2580,10 +3025,85 @@ def calculate():
         if target_time_warning:
             response_data['target_time_warning'] = target_time_warning
         
-        return jsonify(response_data)
+        return response_data, 200
+    except Exception as e:
+        return {'error': str(e)}, 400
+
+# In-process cache of calculated plans (see cached_plan). Entries are keyed by a
+# BLAKE2b digest of the request, so large bodies are never kept as keys, and
+# hold the serialized response; the least recently used entry is dropped when
+# the cache is full.
+PLAN_CACHE_MAX_ENTRIES = 64
+PLAN_CACHE_MAX_REQUEST_BYTES = 64 * 1024
+plan_cache = {}
+plan_cache_lock = threading.Lock()
+
+def cached_plan(data, gpx_path, mtime_ns, size):
+    """
+    calculate_plan, serialized to JSON and cached in-process. Tweaking one
+    field in the planner re-posts an otherwise identical form, and going back
+    to an earlier setting is served from here.
+    
+    The key is a digest of the request body re-serialized with sorted keys, so
+    the same form always gives the same key, plus the GPX file's path, mtime
+    and size, so re-uploading a route under the same name is calculated again.
+    Only successful plans are cached. Requests that carry their own
+    elevation_profile, and other bodies over PLAN_CACHE_MAX_REQUEST_BYTES,
+    are always calculated: they are rarely repeated and their responses are
+    large.
+    """
+    request_key = orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+    if data.get('elevation_profile') or len(request_key) > PLAN_CACHE_MAX_REQUEST_BYTES:
+        response_data, status = calculate_plan(data)
+        return app.json.dumps(response_data), status
+    
+    cache_key = (hashlib.blake2b(request_key, digest_size=16).digest(), gpx_path, mtime_ns, size)
+    with plan_cache_lock:
+        body = plan_cache.pop(cache_key, None)
+        if body is not None:
+            plan_cache[cache_key] = body  # Re-insert as the most recently used
+            return body, 200
+    
+    response_data, status = calculate_plan(data)
+    body = app.json.dumps(response_data)
+    if status == 200:
+        with plan_cache_lock:
+            plan_cache[cache_key] = body
+            while len(plan_cache) > PLAN_CACHE_MAX_ENTRIES:
+                del plan_cache[next(iter(plan_cache))]
+    return body, status
+
+@app.route('/api/calculate', methods=['POST'])
+def calculate():
+    """Calculate race plan."""
+    try:
+        data = request.json
+        if data is None:
+            return jsonify({'error': 'Invalid JSON data'}), 400
+        
+        gpx_path = None if data.get('elevation_profile') else plan_gpx_path(data)
+        try:
+            stat = os.stat(gpx_path) if gpx_path else None
+        except OSError:
+            stat = None  # Missing file: calculate_plan reports it
+        body, status = cached_plan(data, gpx_path,
+                                   stat.st_mtime_ns if stat else None, stat.st_size if stat else None)
+        return app.response_class(body, status=status, mimetype='application/json')
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+# Request fields stored in a saved plan, in file order, with the value used when
+# a field is missing (the carbs fields are filled in by save_plan)
+SAVED_PLAN_FIELDS = (
+    ('plan_name', None), ('gpx_filename', None),
+    ('checkpoint_distances', ()), ('checkpoint_dropbags', ()), ('segment_terrain_types', ()),
+    ('avg_cp_time', None), ('z2_pace', None), ('climbing_ability', None),
+    ('carbs_per_hour', None), ('water_per_hour', None),
+    ('carbs_per_serving', None), ('carbs_per_gel', None),
+    ('race_start_time', None), ('fatigue_enabled', None), ('fitness_level', None), ('skill_level', None),
+    ('segments', None), ('summary', None), ('elevation_profile', None), ('dropbag_contents', None)
+)
+
 @app.route('/api/save-plan', methods=['POST'])
 def save_plan():
     """Save race plan - supports both Supabase and legacy file-based storage."""
@@ -2601,28 +3121,10 @@ def save_plan():
             plan_name = plan_name[:-5]  # Remove .json extension for database storage
         
         # Prepare plan data
-        save_data = {
-            'plan_name': data.get('plan_name'),
-            'gpx_filename': data.get('gpx_filename'),
-            'checkpoint_distances': data.get('checkpoint_distances', []),
-            'checkpoint_dropbags': data.get('checkpoint_dropbags', []),
-            'segment_terrain_types': data.get('segment_terrain_types', []),
-            'avg_cp_time': data.get('avg_cp_time'),
-            'z2_pace': data.get('z2_pace'),
-            'climbing_ability': data.get('climbing_ability'),
-            'carbs_per_hour': data.get('carbs_per_hour'),
-            'water_per_hour': data.get('water_per_hour'),
-            'carbs_per_serving': data.get('carbs_per_serving') or data.get('carbs_per_gel'),  # Return new name, fallback to old
-            'carbs_per_gel': data.get('carbs_per_serving') or data.get('carbs_per_gel'),  # Keep for backward compatibility
-            'race_start_time': data.get('race_start_time'),
-            'fatigue_enabled': data.get('fatigue_enabled'),
-            'fitness_level': data.get('fitness_level'),
-            'skill_level': data.get('skill_level'),
-            'segments': data.get('segments'),
-            'summary': data.get('summary'),
-            'elevation_profile': data.get('elevation_profile'),
-            'dropbag_contents': data.get('dropbag_contents')
-        }
+        save_data = {field: data.get(field, default) for field, default in SAVED_PLAN_FIELDS}
+        carbs_per_serving = data.get('carbs_per_serving') or data.get('carbs_per_gel')
+        save_data['carbs_per_serving'] = carbs_per_serving  # Return new name, fallback to old
+        save_data['carbs_per_gel'] = carbs_per_serving  # Keep for backward compatibility
         
         log_message(f"🚀 SAVE PLAN REQUEST START - Plan name: '{plan_name}'")
         log_message(f"   Supabase enabled: {is_supabase_enabled()}")
@@ -2737,14 +3239,37 @@ def save_plan():
         if force_save_as and os.path.exists(filepath):
             return jsonify({'error': 'A plan with this name already exists. Please choose a different name.'}), 409
         
-        with open(filepath, 'w') as f:
-            json.dump(save_data, f, indent=2)
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(save_data, option=orjson.OPT_INDENT_2))
         
         return jsonify({'message': 'Plan saved successfully', 'filename': plan_filename})
     except Exception as e:
         print(f"Save plan error: {e}")
         return jsonify({'error': str(e)}), 400
 
+# Plan file names that secure_filename() would return unchanged: ASCII letters,
+# digits, '_', '-' and '.', not starting with '.' or '_' (which it strips)
+SAFE_PLAN_FILENAME_RE = re.compile(r'[A-Za-z0-9-][A-Za-z0-9_.-]*\.json')
+
+def safe_plan_filename(filename):
+    """secure_filename() for plan files, skipped for the common already-safe name."""
+    if os.name != 'nt' and SAFE_PLAN_FILENAME_RE.fullmatch(filename):
+        return filename
+    return secure_filename(filename)
+
+def scan_local_plans():
+    """
+    List the plans saved on disk as (filename, modified) pairs, where modified
+    is formatted as 'YYYY-MM-DD HH:MM:SS'. Uses os.scandir so each file is
+    stat'ed once, without building its full path.
+    """
+    plans_folder = app.config['SAVED_PLANS_FOLDER']
+    if not os.path.exists(plans_folder):
+        return []
+    with os.scandir(plans_folder) as entries:
+        return [(entry.name, datetime.fromtimestamp(entry.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S'))
+                for entry in entries if entry.name.endswith('.json') and entry.is_file()]
+
 @app.route('/api/list-plans', methods=['GET'])
 def list_plans():
     """List all saved race plans - always includes local plans + Supabase plans if authenticated."""
@@ -2752,17 +3277,13 @@ def list_plans():
         plans = []
         
         # Always load local file-based plans first
-        if os.path.exists(app.config['SAVED_PLANS_FOLDER']):
-            for filename in os.listdir(app.config['SAVED_PLANS_FOLDER']):
-                if filename.endswith('.json'):
-                    filepath = os.path.join(app.config['SAVED_PLANS_FOLDER'], filename)
-                    modified_time = os.path.getmtime(filepath)
-                    plans.append({
-                        'filename': filename,
-                        'name': filename.replace('.json', ''),
-                        'modified': datetime.fromtimestamp(modified_time).strftime('%Y-%m-%d %H:%M:%S'),
-                        'source': 'local'  # Mark as local plan
-                    })
+        for filename, modified in scan_local_plans():
+            plans.append({
+                'filename': filename,
+                'name': filename.replace('.json', ''),
+                'modified': modified,
+                'source': 'local'  # Mark as local plan
+            })
         
         # Additionally load Supabase plans if enabled and user is identified (authenticated or anonymous)
         if is_supabase_enabled():
@@ -2812,13 +3333,13 @@ def load_plan(filename):
         
         # If source is explicitly 'local', load from disk
         if source == 'local':
-            filepath = os.path.join(app.config['SAVED_PLANS_FOLDER'], secure_filename(filename))
+            filepath = os.path.join(app.config['SAVED_PLANS_FOLDER'], safe_plan_filename(filename))
             
             if not os.path.exists(filepath):
                 return jsonify({'error': 'Plan not found'}), 404
             
-            with open(filepath, 'r') as f:
-                data = json.load(f)
+            with open(filepath, 'rb') as f:
+                data = orjson.loads(f.read())
             
             return jsonify(data)
         
@@ -2894,7 +3415,7 @@ def delete_plan(filename):
         
         # If source is explicitly 'local', delete from disk
         if source == 'local':
-            filepath = os.path.join(app.config['SAVED_PLANS_FOLDER'], secure_filename(filename))
+            filepath = os.path.join(app.config['SAVED_PLANS_FOLDER'], safe_plan_filename(filename))
             
             if not os.path.exists(filepath):
                 return jsonify({'error': 'Plan not found'}), 404
@@ -3086,11 +3607,9 @@ def export_csv():
             header.append('Time of Arrival at CP')
         writer.writerow(header)
         
-        # Data rows
-        for seg in segments:
-            # Extract checkpoint name from segment 'to' field for dynamic column naming
-            checkpoint_name = seg['to']
-            row = [
+        # Data rows (built up front and written in a single writerows call)
+        rows = [
+            [
                 f"{seg['from']} to {seg['to']}",
                 seg['cumulative_distance'],
                 seg['elev_gain'],
@@ -3106,51 +3625,59 @@ def export_csv():
                 seg['target_water'],
                 seg['cumulative_time_str']
             ]
-            if race_start_time:
+            for seg in segments
+        ]
+        if race_start_time:
+            for row, seg in zip(rows, segments):
                 row.append(seg.get('time_of_day', ''))
-            writer.writerow(row)
+        writer.writerows(rows)
         
         # Summary
-        writer.writerow([])
-        writer.writerow(['SUMMARY'])
-        writer.writerow(['Total Moving Time', summary.get('total_moving_time_str')])
-        writer.writerow(['Total CP Time', summary.get('total_cp_time_str')])
-        writer.writerow(['Total Race Time', summary.get('total_race_time_str')])
-        writer.writerow(['Total Distance (km)', summary.get('total_distance')])
-        writer.writerow(['Total Elev Gain (m)', summary.get('total_elev_gain')])
-        writer.writerow(['Total Carbs (g)', summary.get('total_carbs')])
-        writer.writerow(['Total Water (L)', summary.get('total_water')])
+        writer.writerows([
+            [],
+            ['SUMMARY'],
+            ['Total Moving Time', summary.get('total_moving_time_str')],
+            ['Total CP Time', summary.get('total_cp_time_str')],
+            ['Total Race Time', summary.get('total_race_time_str')],
+            ['Total Distance (km)', summary.get('total_distance')],
+            ['Total Elev Gain (m)', summary.get('total_elev_gain')],
+            ['Total Carbs (g)', summary.get('total_carbs')],
+            ['Total Water (L)', summary.get('total_water')]
+        ])
         
         # Dropbag contents
         if dropbag_contents and len(dropbag_contents) > 0:
-            writer.writerow([])
-            writer.writerow(['DROP BAG CONTENTS'])
+            writer.writerows([[], ['DROP BAG CONTENTS']])
             
             # Check if serving data is present
             has_serving_data = any('num_servings' in dropbag or 'num_gels' in dropbag for dropbag in dropbag_contents)  # Check both for backward compatibility
             
             if has_serving_data:
                 writer.writerow(['Checkpoint', 'Carb Target (g)', 'Number of Energy Servings', 'Actual Carbs (g)', 'Hydration Target (L)'])
-                for dropbag in dropbag_contents:
-                    writer.writerow([
+                writer.writerows([
+                    [
                         dropbag['checkpoint'], 
                         dropbag['carbs'], 
                         dropbag.get('num_servings') or dropbag.get('num_gels', ''),  # Try new name first, fallback to old
                         dropbag.get('actual_carbs', ''),
                         dropbag['hydration']
-                    ])
+                    ]
+                    for dropbag in dropbag_contents
+                ])
             else:
                 writer.writerow(['Checkpoint', 'Carb Target (g)', 'Hydration Target (L)'])
-                for dropbag in dropbag_contents:
-                    writer.writerow([dropbag['checkpoint'], dropbag['carbs'], dropbag['hydration']])
+                writer.writerows([[dropbag['checkpoint'], dropbag['carbs'], dropbag['hydration']]
+                                  for dropbag in dropbag_contents])
         
         csv_content = output.getvalue()
         output.close()
         
-        return send_file(io.BytesIO(csv_content.encode('utf-8')), 
-                        as_attachment=True, 
-                        download_name=csv_filename, 
-                        mimetype='text/csv')
+        # Return the text directly rather than through send_file, which would copy it
+        # into a BytesIO and mark the response as passthrough (skipping compression)
+        return Response(csv_content, mimetype='text/csv', headers={
+            'Content-Disposition': f'attachment; filename={csv_filename}',
+            'Cache-Control': 'no-cache'
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -3158,6 +3685,15 @@ def export_csv():
 @app.route('/api/export-pdf', methods=['POST'])
 def export_pdf():
     """Export race plan to PDF with configurable sections."""
+    # Imported on first use: reportlab is the slowest import in the app and only
+    # this endpoint needs it
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter, A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak, KeepTogether
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+    from PIL import Image as PILImage
     try:
         data = request.json
         if data is None:
@@ -3625,17 +4161,13 @@ def list_local_plans():
     """List all plans saved locally on disk."""
     try:
         plans = []
-        if os.path.exists(app.config['SAVED_PLANS_FOLDER']):
-            for filename in os.listdir(app.config['SAVED_PLANS_FOLDER']):
-                if filename.endswith('.json'):
-                    filepath = os.path.join(app.config['SAVED_PLANS_FOLDER'], filename)
-                    modified_time = os.path.getmtime(filepath)
-                    plans.append({
-                        'id': filename,  # Use filename as ID for local plans
-                        'name': filename.replace('.json', ''),
-                        'created_at': datetime.fromtimestamp(modified_time).strftime('%Y-%m-%d %H:%M:%S'),
-                        'updated_at': datetime.fromtimestamp(modified_time).strftime('%Y-%m-%d %H:%M:%S')
-                    })
+        for filename, modified in scan_local_plans():
+            plans.append({
+                'id': filename,  # Use filename as ID for local plans
+                'name': filename.replace('.json', ''),
+                'created_at': modified,
+                'updated_at': modified
+            })
         
         # Sort by modification time
         plans.sort(key=lambda x: x['updated_at'], reverse=True)
@@ -3652,17 +4184,13 @@ def list_unowned_plans():
         plans = []
         
         # Get local disk plans
-        if os.path.exists(app.config['SAVED_PLANS_FOLDER']):
-            for filename in os.listdir(app.config['SAVED_PLANS_FOLDER']):
-                if filename.endswith('.json'):
-                    filepath = os.path.join(app.config['SAVED_PLANS_FOLDER'], filename)
-                    modified_time = os.path.getmtime(filepath)
-                    plans.append({
-                        'filename': filename,
-                        'name': filename.replace('.json', ''),
-                        'modified': datetime.fromtimestamp(modified_time).strftime('%Y-%m-%d %H:%M:%S'),
-                        'source': 'local'  # Mark as local plan
-                    })
+        for filename, modified in scan_local_plans():
+            plans.append({
+                'filename': filename,
+                'name': filename.replace('.json', ''),
+                'modified': modified,
+                'source': 'local'  # Mark as local plan
+            })
         
         # Get anonymous Supabase plans (plans with anonymous_id but no owner_id)
         if is_supabase_enabled():
@@ -3720,13 +4248,13 @@ def migrate_local_plan():
         user_id = user.user.id
         
         # Read the local plan file
-        filepath = os.path.join(app.config['SAVED_PLANS_FOLDER'], secure_filename(filename))
+        filepath = os.path.join(app.config['SAVED_PLANS_FOLDER'], safe_plan_filename(filename))
         
         if not os.path.exists(filepath):
             return jsonify({'error': 'Plan not found'}), 404
         
-        with open(filepath, 'r') as f:
-            plan_data = json.load(f)
+        with open(filepath, 'rb') as f:
+            plan_data = orjson.loads(f.read())
         
         plan_name = filename.replace('.json', '')
         
@@ -3904,6 +4432,7 @@ def about():
 @app.route('/docs/<path:doc_path>')
 def documentation(doc_path=None):
     """Render documentation pages with markdown content from /docs folder."""
+    import markdown2
     docs_base = os.path.join(os.path.dirname(__file__), 'docs')
     
     # Get all documentation files organized by category
@@ -0,0 +1,25 @@
+"""
+Gunicorn configuration for RaceCraft.
+
+Gunicorn loads this file automatically from the working directory, so the
+Procfile, Dockerfile and docker-compose commands only need to set the bind
+address. Worker and thread counts can be overridden with the WEB_CONCURRENCY
+and GUNICORN_THREADS environment variables.
+"""
+
+import multiprocessing
+import os
+
+# The usual 2 * CPU + 1, capped at 4: cpu_count() reports the host's cores, not
+# the container's CPU limit, and every process imports NumPy and keeps its own
+# route, plan and token caches. Threads below provide the concurrency; set
+# WEB_CONCURRENCY to run more processes on a larger instance
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+
+# Threaded workers: requests waiting on Supabase release the GIL, so other
+# requests in the same process keep being served instead of queueing
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Large GPX uploads on a cold .npz cache can take a few seconds to parse
+timeout = 60
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test script for the vectorized pacing model.
+Checks that the per-route vectorized functions match the scalar per-segment model.
+"""
+
+import sys
+import os
+import random
+
+# Add parent directory to path to import from app.py
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+from app import (
+    adjust_pace_for_elevation,
+    adjust_paces_for_segments,
+    format_time,
+    format_pace,
+    format_fatigue,
+    calculate_times_of_day,
+    calculate_dropbag_contents,
+    CLIMBING_ABILITY_PARAMS,
+    FITNESS_LEVEL_PARAMS,
+    TERRAIN_FACTORS
+)
+
+
+def random_segments(rng, count):
+    """Random segments covering flat, climbing, descending and zero-length cases."""
+    segments = []
+    for _ in range(count):
+        distance = 0.0 if rng.random() < 0.05 else round(rng.uniform(0.2, 25.0), 2)
+        gain = round(rng.choice([0.0, rng.uniform(0.0, 2500.0)]), 1)
+        loss = round(rng.choice([0.0, rng.uniform(0.0, 2500.0)]), 1)
+        terrain = rng.choice(list(TERRAIN_FACTORS) + ['unknown'])
+        segments.append((distance, gain, loss, terrain))
+    return segments
+
+
+def scalar_reference(base_pace, segments, climbing_ability, fatigue_enabled, fitness_level, skill_level):
+    """Run the scalar model segment by segment, tracking cumulative effort like calculate()."""
+    results = []
+    cumulative_effort = 0.0
+    for distance, gain, loss, terrain in segments:
+        results.append(adjust_pace_for_elevation(
+            base_pace, gain, loss, distance, cumulative_effort, climbing_ability,
+            fatigue_enabled, fitness_level, terrain, skill_level
+        ))
+        cumulative_effort += distance + (gain / 100.0) + (loss / 200.0)
+    return results
+
+
+def test_vectorized_matches_scalar():
+    """Vectorized paces match the scalar model for random routes and athletes."""
+    print("\n" + "="*70)
+    print("TEST 1: Vectorized vs Scalar Pace Adjustment")
+    print("="*70)
+
+    rng = random.Random(7)
+    checked = 0
+    for _ in range(300):
+        segments = random_segments(rng, rng.randint(1, 31))
+        base_pace = round(rng.uniform(4.0, 12.0), 2)
+        climbing_ability = rng.choice(list(CLIMBING_ABILITY_PARAMS))
+        fitness_level = rng.choice(list(FITNESS_LEVEL_PARAMS))
+        fatigue_enabled = rng.random() < 0.8
+        skill_level = rng.choice([0.0, 0.5, 1.0, round(rng.random(), 2)])
+
+        expected = scalar_reference(base_pace, segments, climbing_ability,
+                                    fatigue_enabled, fitness_level, skill_level)
+        vectorized = adjust_paces_for_segments(
+            base_pace,
+            [gain for _, gain, _, _ in segments],
+            [loss for _, _, loss, _ in segments],
+            [distance for distance, _, _, _ in segments],
+            [terrain for _, _, _, terrain in segments],
+            climbing_ability, fatigue_enabled, fitness_level, skill_level
+        )
+
+        for i, scalar_result in enumerate(expected):
+            for field, (scalar_value, vector_value) in enumerate(zip(scalar_result, vectorized)):
+                assert abs(float(scalar_value) - float(vector_value[i])) < 1e-9, (
+                    f"segment {i} field {field}: {scalar_value} != {vector_value[i]}"
+                )
+            checked += 1
+    print(f"  ✓ PASS: {checked} segments match the scalar model")
+
+
+def test_empty_route():
+    """A route without segments returns empty arrays."""
+    print("\n" + "="*70)
+    print("TEST 2: Empty Segment List")
+    print("="*70)
+
+    results = adjust_paces_for_segments(6.5, [], [], [], [])
+    assert all(len(values) == 0 for values in results)
+    print("  ✓ PASS: Empty input gives empty results")
+
+
+def test_format_time():
+    """Times are rounded to the nearest second, not truncated."""
+    print("\n" + "="*70)
+    print("TEST 3: Time Formatting")
+    print("="*70)
+
+    assert format_time(0) == "00:00:00"
+    assert format_time(90.5) == "01:30:30"
+    assert format_time(59.99999) == "01:00:00"  # Truncation used to give 00:59:59
+    assert format_time(1500.25) == "25:00:15"
+    print("  ✓ PASS: HH:MM:SS formatting rounds to the nearest second")
+
+    assert format_pace(6.5) == "6:30" and format_pace(5.999) == "5:59" and format_pace(12.05) == "12:03"
+    assert format_fatigue(0.0) == "+0:00" and format_fatigue(125.7) == "+2:05"
+    print("  ✓ PASS: Paces and fatigue format as M:SS")
+
+    assert calculate_times_of_day("05:30", [0.0, 90.5, 1111.9999, 1500.0]) == ["05:30", "07:00", "00:02", "06:30"]
+    assert calculate_times_of_day(None, [10.0, 20.0]) == [None, None]
+    assert calculate_times_of_day("early", [10.0]) == [None]
+    print("  ✓ PASS: Times of day wrap past midnight and match the rounded elapsed time")
+
+
+def test_dropbag_contents():
+    """Segments are carried from the last dropbag at or before their departure checkpoint."""
+    print("\n" + "="*70)
+    print("TEST 4: Dropbag Contents")
+    print("="*70)
+
+    segments = [{'target_carbs': carbs, 'target_water': water}
+                for carbs, water in [(40.2, 0.55), (60.0, 0.8), (35.4, 0.45), (70.1, 0.9), (20.0, 0.3)]]
+
+    contents = calculate_dropbag_contents(segments, [False, True, False, False], carbs_per_serving=25)
+    assert contents == [
+        {'checkpoint': 'Start', 'carbs': 40, 'hydration': 0.6, 'num_servings': 2, 'actual_carbs': 50},
+        # CP2 carries CP2->CP3, CP3->CP4 and CP4->Finish; CP1->CP2 has no dropbag before it
+        {'checkpoint': 'CP2', 'carbs': 126, 'hydration': 1.7, 'num_servings': 5, 'actual_carbs': 125},
+    ], contents
+    print("  ✓ PASS: Nutrition accumulates into the previous dropbag")
+
+    contents = calculate_dropbag_contents(segments, [True, False, False, True])
+    assert [(item['checkpoint'], item['carbs']) for item in contents] == [('Start', 40), ('CP1', 166), ('CP4', 20)]
+    assert calculate_dropbag_contents(segments, [False, False]) == contents[:1]
+    assert calculate_dropbag_contents([], [True]) == [{'checkpoint': 'CP1', 'carbs': 0, 'hydration': 0.0}]
+    print("  ✓ PASS: Unused dropbags and routes without dropbags are handled")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*70)
+    print("PACING MODEL TEST SUITE")
+    print("="*70)
+
+    tests = [test_vectorized_matches_scalar, test_empty_route, test_format_time, test_dropbag_contents]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            print(f"  ✗ FAIL: {test.__name__} {e}")
+            failed += 1
+
+    print("\n" + "="*70)
+    if failed == 0:
+        print("\n✓ ALL TESTS PASSED\n")
+        return 0
+    print(f"\n✗ {failed} TEST(S) FAILED\n")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
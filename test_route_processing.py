@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Test script for the vectorized route processing helpers.
+Checks the NumPy distance calculations against the scalar haversine reference.
+"""
+
+import sys
+import os
+import io
+import random
+import shutil
+import tempfile
+
+import numpy as np
+
+# Add parent directory to path to import from app.py
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+import app
+from app import (
+    haversine_distance,
+    Track,
+    parse_gpx_file,
+    calculate_segment_distances,
+    find_checkpoint_indices,
+    find_nearest_distance_indices,
+    find_checkpoint_indices_from_profile,
+    elevation_prefix_sums,
+    calculate_elevation_change,
+    gpx_cache_path,
+    load_gpx_track,
+    load_route,
+    route_kernel,
+    compute_route,
+    EQUIRECTANGULAR_MAX_SPAN_RAD
+)
+
+# Small synthetic route: a few hundred metres between points, with climbs and descents
+SAMPLE_TRACKPOINTS = [
+    (-36.4500, 148.2600, 1800.0),
+    (-36.4520, 148.2630, 1815.5),
+    (-36.4550, 148.2650, 1840.0),
+    (-36.4590, 148.2660, 1832.0),
+    (-36.4600, 148.2700, 1790.0),
+    (-36.4600, 148.2700, 1790.0),  # Duplicate point (GPS pause)
+    (-36.4640, 148.2750, 1755.2),
+    (-36.4700, 148.2790, 1760.0),
+]
+
+
+def make_track(trackpoints):
+    """Build a Track of parallel arrays from (lat, lon, elev) tuples."""
+    columns = list(zip(*trackpoints)) or [(), (), ()]
+    return Track(*(np.array(column, dtype=np.float64) for column in columns))
+
+
+def reference_cumulative_distances(trackpoints):
+    """Cumulative distances computed with the scalar haversine loop."""
+    distances = [0.0]
+    for i in range(len(trackpoints) - 1):
+        lat1, lon1, _ = trackpoints[i]
+        lat2, lon2, _ = trackpoints[i + 1]
+        distances.append(distances[-1] + haversine_distance(lat1, lon1, lat2, lon2))
+    return distances
+
+
+SAMPLE_GPX_TRACK = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <wpt lat="-36.0" lon="148.0"><ele>2000.0</ele></wpt>
+  <rte><rtept lat="-36.0" lon="148.0"><ele>1.0</ele></rtept></rte>
+  <trk><trkseg>
+    <trkpt lat="-36.4500" lon="148.2600"><ele>1800.0</ele><time>2026-01-01T00:00:00Z</time></trkpt>
+    <trkpt lat="-36.4520" lon="148.2630"><ele>1815.5</ele></trkpt>
+    <trkpt lat="-36.4550"><ele>1830.0</ele></trkpt>
+    <trkpt lat="-36.4550" lon="148.2650"></trkpt>
+  </trkseg></trk>
+</gpx>"""
+
+SAMPLE_GPX_ROUTE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test">
+  <rte>
+    <rtept lat="-36.4500" lon="148.2600"><ele>1800.0</ele></rtept>
+    <rtept lat="-36.4520" lon="148.2630"><ele></ele></rtept>
+  </rte>
+</gpx>"""
+
+
+def test_parse_gpx():
+    """GPX parsing handles namespaces, missing values and route-only files."""
+    print("\n" + "="*70)
+    print("TEST 1: GPX Parsing")
+    print("="*70)
+
+    track = parse_gpx_file(io.BytesIO(SAMPLE_GPX_TRACK))
+    assert track.lats.tolist() == [-36.45, -36.452, -36.455]
+    assert track.lons.tolist() == [148.26, 148.263, 148.265]
+    assert track.elevs.tolist() == [1800.0, 1815.5, 0.0]
+    print("  ✓ PASS: Namespaced track points parsed, incomplete points and waypoints skipped")
+
+    route = parse_gpx_file(io.BytesIO(SAMPLE_GPX_ROUTE))
+    assert route.lats.tolist() == [-36.45, -36.452]
+    assert route.elevs.tolist() == [1800.0, 0.0]
+    print("  ✓ PASS: Route points used when the file has no track")
+
+    max_trackpoints = app.MAX_TRACKPOINTS
+    app.MAX_TRACKPOINTS = 2
+    try:
+        parse_gpx_file(io.BytesIO(SAMPLE_GPX_TRACK))
+        assert False, "expected ValueError for too many points"
+    except ValueError:
+        pass
+    finally:
+        app.MAX_TRACKPOINTS = max_trackpoints
+    print("  ✓ PASS: Files with too many points are rejected")
+
+
+def test_vectorized_distances():
+    """Vectorized segment distances match the scalar haversine."""
+    print("\n" + "="*70)
+    print("TEST 2: Vectorized Haversine Distances")
+    print("="*70)
+
+    track = make_track(SAMPLE_TRACKPOINTS)
+    expected = reference_cumulative_distances(SAMPLE_TRACKPOINTS)
+
+    segments = calculate_segment_distances(track)
+    assert len(segments) == len(SAMPLE_TRACKPOINTS) - 1
+
+    cum_dist, _, _ = compute_route(track)
+    total = cum_dist[-1]
+    print(f"  Total distance: {total:.4f} km (scalar reference: {expected[-1]:.4f} km)")
+    assert abs(total - expected[-1]) < 1e-6
+    print("  ✓ PASS: Vectorized total matches scalar haversine")
+
+
+def test_checkpoint_lookup():
+    """Checkpoint lookup returns the nearest trackpoint index."""
+    print("\n" + "="*70)
+    print("TEST 3: Checkpoint Index Lookup")
+    print("="*70)
+
+    track = make_track(SAMPLE_TRACKPOINTS)
+    expected = reference_cumulative_distances(SAMPLE_TRACKPOINTS)
+    checkpoint_distances = [0.0, 0.31, expected[4], expected[5] + 0.01, 5.0, -1.0]
+
+    cum_dist = [0.0]
+    for segment_dist in calculate_segment_distances(track):
+        cum_dist.append(cum_dist[-1] + segment_dist)
+    checkpoint_indices, distances = find_checkpoint_indices(cum_dist, checkpoint_distances)
+
+    # Reference: first index with the smallest absolute difference
+    expected_indices = [0]
+    for cp_dist in checkpoint_distances:
+        expected_indices.append(min(range(len(expected)), key=lambda i: abs(expected[i] - cp_dist)))
+    expected_indices.append(len(SAMPLE_TRACKPOINTS) - 1)
+
+    print(f"  Indices:  {checkpoint_indices}")
+    print(f"  Expected: {expected_indices}")
+    assert checkpoint_indices == expected_indices
+    assert len(distances) == len(SAMPLE_TRACKPOINTS)
+    print("  ✓ PASS: Checkpoints snap to the nearest trackpoint")
+
+
+def test_nearest_index_matches_linear_scan():
+    """Binary search lookup agrees with a linear scan, including repeated distances."""
+    print("\n" + "="*70)
+    print("TEST 4: Nearest Index Search vs Linear Scan")
+    print("="*70)
+
+    rng = random.Random(42)
+    for _ in range(200):
+        distances = [0.0]
+        for _ in range(rng.randint(1, 40)):
+            # Roughly one in four steps is a zero-length segment
+            step = 0.0 if rng.random() < 0.25 else round(rng.uniform(0.0, 0.5), 2)
+            distances.append(round(distances[-1] + step, 2))
+        targets = [round(rng.uniform(-1.0, distances[-1] + 1.0), 2) for _ in range(rng.randint(0, 8))]
+
+        expected = [min(range(len(distances)), key=lambda i: abs(distances[i] - t)) for t in targets]
+        assert find_nearest_distance_indices(distances, targets).tolist() == expected
+
+        profile = [{'distance': d, 'elevation': 0.0} for d in distances]
+        checkpoint_indices, _ = find_checkpoint_indices_from_profile(profile, targets)
+        assert checkpoint_indices == [0] + expected + [len(distances) - 1]
+    print("  ✓ PASS: 200 random routes resolve to the same indices")
+
+
+def test_elevation_prefix_sums():
+    """Prefix-sum elevation gain/loss matches a per-segment loop."""
+    print("\n" + "="*70)
+    print("TEST 5: Elevation Gain/Loss Prefix Sums")
+    print("="*70)
+
+    cum_gain, cum_loss = elevation_prefix_sums(make_track(SAMPLE_TRACKPOINTS).elevs)
+
+    for start_idx in range(len(SAMPLE_TRACKPOINTS)):
+        for end_idx in range(start_idx, len(SAMPLE_TRACKPOINTS)):
+            expected_gain = 0.0
+            expected_loss = 0.0
+            for i in range(start_idx, end_idx):
+                elev_change = SAMPLE_TRACKPOINTS[i + 1][2] - SAMPLE_TRACKPOINTS[i][2]
+                if elev_change > 0:
+                    expected_gain += elev_change
+                else:
+                    expected_loss += abs(elev_change)
+            gain, loss = calculate_elevation_change(cum_gain, cum_loss, start_idx, end_idx)
+            assert abs(gain - expected_gain) < 1e-9
+            assert abs(loss - expected_loss) < 1e-9
+    print(f"  Total gain: {cum_gain[-1]:.1f} m, total loss: {cum_loss[-1]:.1f} m")
+    print("  ✓ PASS: Every segment matches the trackpoint loop")
+
+
+def test_empty_route():
+    """Routes with fewer than two points have zero distance."""
+    print("\n" + "="*70)
+    print("TEST 6: Degenerate Routes")
+    print("="*70)
+
+    for trackpoints in ([], SAMPLE_TRACKPOINTS[:1]):
+        track = make_track(trackpoints)
+        cum_dist, cum_gain, cum_loss = compute_route(track)
+        assert cum_dist[-1] == 0.0 and cum_gain[-1] == 0.0 and cum_loss[-1] == 0.0
+        profile = app.build_elevation_profile(cum_dist, track.elevs)
+        assert profile == [{'distance': 0.0, 'elevation': point[2]} for point in trackpoints]
+    print("  ✓ PASS: Empty and single-point routes have zero distance")
+
+    tmp_dir = tempfile.mkdtemp()
+    upload_folder = app.app.config['UPLOAD_FOLDER']
+    app.app.config['UPLOAD_FOLDER'] = tmp_dir
+    try:
+        with open(os.path.join(tmp_dir, 'empty.gpx'), 'wb') as f:
+            f.write(b'<gpx></gpx>')
+        response = app.app.test_client().post('/api/calculate', json={'gpx_filename': 'empty.gpx'})
+        assert response.status_code == 200, response.get_json()
+        assert response.get_json()['elevation_profile'] == []
+    finally:
+        app.app.config['UPLOAD_FOLDER'] = upload_folder
+        shutil.rmtree(tmp_dir)
+    print("  ✓ PASS: A GPX file without points plans with an empty profile")
+
+
+def test_gpx_cache():
+    """Parsed GPX arrays are cached in a .npz sidecar and refreshed when the GPX changes."""
+    print("\n" + "="*70)
+    print("TEST 7: GPX .npz Sidecar Cache")
+    print("="*70)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        gpx_path = os.path.join(tmp_dir, 'route.gpx')
+        with open(gpx_path, 'wb') as f:
+            f.write(SAMPLE_GPX_ROUTE)
+
+        parsed = load_gpx_track(gpx_path)
+        cache_path = gpx_cache_path(gpx_path)
+        assert os.path.exists(cache_path)
+        cached = load_gpx_track(gpx_path)
+        parsed_arrays = [*parsed[0], *parsed[1:]]
+        cached_arrays = [*cached[0], *cached[1:]]
+        assert isinstance(cached[0], Track)
+        for parsed_array, cached_array in zip(parsed_arrays, cached_arrays):
+            assert parsed_array.tolist() == cached_array.tolist()
+        print("  ✓ PASS: Cached arrays match the parsed GPX")
+
+        # Rewriting the GPX file makes the sidecar stale, even with an older mtime
+        with open(gpx_path, 'wb') as f:
+            f.write(SAMPLE_GPX_TRACK)
+        cache_mtime = os.stat(cache_path).st_mtime_ns
+        os.utime(gpx_path, ns=(cache_mtime - 1, cache_mtime - 1))
+        track, cum_dist, _, _ = load_gpx_track(gpx_path)
+        assert len(track.lats) == 3 and track.elevs.tolist() == [1800.0, 1815.5, 0.0]
+        assert cum_dist[0] == 0.0 and len(cum_dist) == 3
+        print("  ✓ PASS: Stale cache is replaced after the GPX file changes")
+
+        # A same-size re-upload that lands while the old file is being parsed
+        with open(gpx_path, 'wb') as f:
+            f.write(SAMPLE_GPX_ROUTE)
+        os.remove(cache_path)
+        replacement = SAMPLE_GPX_ROUTE.replace(b'-36.4520', b'-36.4570')
+        parse_gpx_file = app.parse_gpx_file
+
+        def parse_then_replace(path):
+            track = parse_gpx_file(path)
+            with open(path, 'wb') as f:
+                f.write(replacement)
+            # Lands before the sidecar is written, so the sidecar ends up newer
+            mtime_ns = os.stat(path).st_mtime_ns - 1_000_000_000
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+            return track
+
+        app.parse_gpx_file = parse_then_replace
+        try:
+            assert load_gpx_track(gpx_path)[0].lats[1] == -36.452
+        finally:
+            app.parse_gpx_file = parse_gpx_file
+        assert load_gpx_track(gpx_path)[0].lats[1] == -36.457
+        assert load_gpx_track(gpx_path)[0].lats[1] == -36.457
+        print("  ✓ PASS: File replaced mid-parse is not served from the old sidecar")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_fused_route_kernel():
+    """The fused single-pass kernel matches the NumPy distance and elevation functions."""
+    print("\n" + "="*70)
+    print("TEST 8: Fused Route Kernel")
+    print("="*70)
+
+    # Include a long hop so the haversine branch is exercised as well
+    trackpoints = SAMPLE_TRACKPOINTS + [(-36.6, 148.4, 1500.0)]
+    track = make_track(trackpoints)
+    n = len(trackpoints)
+    cum_dist, cum_gain, cum_loss = np.zeros(n), np.zeros(n), np.zeros(n)
+    # Compiled when numba is installed, plain Python otherwise
+    route_kernel(np.radians(track.lats), np.radians(track.lons), track.elevs,
+                 EQUIRECTANGULAR_MAX_SPAN_RAD, cum_dist, cum_gain, cum_loss)
+
+    # The NumPy path directly: compute_route itself calls the kernel when numba is installed
+    expected_dist = np.concatenate(([0.0], np.cumsum(calculate_segment_distances(track))))
+    expected_gain, expected_loss = elevation_prefix_sums(track.elevs)
+    assert np.allclose(cum_dist, expected_dist, rtol=0, atol=1e-9)
+    assert np.allclose(cum_gain, expected_gain, rtol=0, atol=1e-9)
+    assert np.allclose(cum_loss, expected_loss, rtol=0, atol=1e-9)
+    print(f"  Total distance: {cum_dist[-1]:.4f} km, gain: {cum_gain[-1]:.1f} m, loss: {cum_loss[-1]:.1f} m")
+    print("  ✓ PASS: Kernel matches the vectorized route calculation")
+
+
+def test_route_memory_cache():
+    """Repeated loads of an unchanged GPX file are served from the in-process cache."""
+    print("\n" + "="*70)
+    print("TEST 9: In-Process Route Cache")
+    print("="*70)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        gpx_path = os.path.join(tmp_dir, 'route.gpx')
+        with open(gpx_path, 'wb') as f:
+            f.write(SAMPLE_GPX_ROUTE)
+
+        route = load_route(gpx_path)
+        assert load_route(gpx_path) is route
+        assert not route[1].flags.writeable and not route[0].lats.flags.writeable
+        print("  ✓ PASS: Unchanged file returns the cached, read-only arrays")
+
+        gpx_stat = os.stat(gpx_path)
+        with np.load(app.gpx_cache_path(gpx_path)) as cached:
+            assert int(cached['source_mtime_ns']) == gpx_stat.st_mtime_ns
+            assert int(cached['source_size']) == gpx_stat.st_size
+        print("  ✓ PASS: Sidecar is keyed on the same mtime and size as the route cache")
+
+        summary = app.load_route_summary(gpx_path)
+        assert summary.total_distance == route[1][-1] and summary.total_elev_gain == route[2][-1]
+        assert summary.total_elev_loss == route[3][-1] and summary.num_trackpoints == len(route[0].lats)
+        print("  ✓ PASS: Route summary is read off the cached prefix arrays")
+
+        with open(gpx_path, 'wb') as f:
+            f.write(SAMPLE_GPX_TRACK)
+        mtime_ns = os.stat(gpx_path).st_mtime_ns + 1_000_000
+        os.utime(gpx_path, ns=(mtime_ns, mtime_ns))
+        reloaded = load_route(gpx_path)
+        assert reloaded is not route and len(reloaded[0].lats) == 3
+        print("  ✓ PASS: Modified file is loaded again")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_elevation_profile_sampling():
+    """Long routes are simplified to at most 500 points without losing peaks."""
+    print("\n" + "="*70)
+    print("TEST 10: Elevation Profile Sampling")
+    print("="*70)
+
+    cum_dist = np.linspace(0.0, 42.2, 1234)
+    elevs = np.linspace(100.0, 900.0, 1234)
+    profile = app.build_elevation_profile(cum_dist, elevs)
+    indices = np.linspace(0, 1233, 250).round().astype(int)
+    expected = [{'distance': round(d, 3), 'elevation': round(e, 1)}
+                for d, e in zip(cum_dist[indices].tolist(), elevs[indices].tolist())]
+    assert profile == expected
+    print(f"  ✓ PASS: Even grade of {len(cum_dist)} trackpoints reduced to {len(profile)} evenly spaced points")
+
+    # A one-point summit that falls between the evenly spaced samples
+    peaked = np.full(1234, 500.0)
+    peaked[3] = 750.0
+    profile = app.build_elevation_profile(cum_dist, peaked)
+    assert max(point['elevation'] for point in profile) == 750.0
+    assert profile[0]['distance'] == 0.0 and profile[-1]['distance'] == 42.2
+
+    noisy = np.random.default_rng(3).normal(500.0, 40.0, 20000)
+    indices = app.simplify_elevation_profile(np.linspace(0.0, 170.0, 20000), noisy)
+    assert len(indices) == 500 and np.all(np.diff(indices) > 0)
+    assert np.argmax(noisy) in indices and np.argmin(noisy) in indices
+    assert np.diff(indices).max() <= 81  # never further apart than the even samples
+    print("  ✓ PASS: Peaks and valleys between samples are kept, capped at 500 points")
+
+    short = app.build_elevation_profile(cum_dist[:3], elevs[:3])
+    assert [point['distance'] for point in short] == [0.0, 0.034, 0.068]
+    assert app.build_elevation_profile(np.zeros(0), np.zeros(0)) == []
+    print("  ✓ PASS: Short routes keep every point")
+
+
+def test_plan_response_cache():
+    """Identical plan requests are served from the cache until the GPX file changes."""
+    print("\n" + "="*70)
+    print("TEST 11: Plan Response Cache")
+    print("="*70)
+
+    tmp_dir = tempfile.mkdtemp()
+    upload_folder = app.app.config['UPLOAD_FOLDER']
+    app.app.config['UPLOAD_FOLDER'] = tmp_dir
+    try:
+        gpx_path = os.path.join(tmp_dir, 'plan.gpx')
+        with open(gpx_path, 'wb') as f:
+            f.write(SAMPLE_GPX_ROUTE)
+
+        client = app.app.test_client()
+        request_data = {'gpx_filename': 'plan.gpx', 'checkpoint_distances': [0.5], 'z2_pace': 6.5}
+        calls = []
+        calculate_plan = app.calculate_plan
+
+        def counting_calculate_plan(data):
+            calls.append(data)
+            return calculate_plan(data)
+
+        app.calculate_plan = counting_calculate_plan
+        try:
+            first = client.post('/api/calculate', json=request_data)
+            second = client.post('/api/calculate', json=dict(reversed(list(request_data.items()))))
+            assert first.status_code == 200 and second.data == first.data and len(calls) == 1
+            assert all(len(key[0]) == 16 for key in app.plan_cache)
+            print("  ✓ PASS: Same request (in any key order) is served from the cache")
+
+            entries = len(app.plan_cache)
+            profile_request = dict(request_data, elevation_profile=first.get_json()['elevation_profile'])
+            large_request = dict(request_data, notes='x' * app.PLAN_CACHE_MAX_REQUEST_BYTES)
+            for body in (profile_request, profile_request, large_request, {'gpx_filename': 'missing.gpx'}):
+                client.post('/api/calculate', json=body)
+            assert len(calls) == 5 and len(app.plan_cache) == entries
+            print("  ✓ PASS: Profile requests, large bodies and errors are not cached")
+
+            max_entries = app.PLAN_CACHE_MAX_ENTRIES
+            app.PLAN_CACHE_MAX_ENTRIES = 1
+            try:
+                client.post('/api/calculate', json=dict(request_data, z2_pace=7.0))
+                assert len(app.plan_cache) == 1
+                client.post('/api/calculate', json=request_data)
+                assert len(calls) == 7  # The first plan was dropped to make room
+            finally:
+                app.PLAN_CACHE_MAX_ENTRIES = max_entries
+            print("  ✓ PASS: Cache keeps at most PLAN_CACHE_MAX_ENTRIES plans")
+        finally:
+            app.calculate_plan = calculate_plan
+
+        with open(gpx_path, 'wb') as f:
+            f.write(SAMPLE_GPX_TRACK)
+        mtime_ns = os.stat(gpx_path).st_mtime_ns + 1_000_000
+        os.utime(gpx_path, ns=(mtime_ns, mtime_ns))
+        replanned = client.post('/api/calculate', json=request_data)
+        assert replanned.status_code == 200 and replanned.data != first.data
+        print("  ✓ PASS: Re-uploaded GPX file is planned again")
+    finally:
+        app.app.config['UPLOAD_FOLDER'] = upload_folder
+        shutil.rmtree(tmp_dir)
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*70)
+    print("ROUTE PROCESSING TEST SUITE")
+    print("="*70)
+
+    tests = [test_parse_gpx, test_vectorized_distances, test_checkpoint_lookup,
+             test_nearest_index_matches_linear_scan, test_elevation_prefix_sums,
+             test_empty_route, test_gpx_cache, test_fused_route_kernel,
+             test_route_memory_cache, test_elevation_profile_sampling,
+             test_plan_response_cache]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            print(f"  ✗ FAIL: {test.__name__} {e}")
+            failed += 1
+
+    print("\n" + "="*70)
+    if failed == 0:
+        print("\n✓ ALL TESTS PASSED\n")
+        return 0
+    print(f"\n✗ {failed} TEST(S) FAILED\n")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())